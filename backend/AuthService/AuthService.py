@@ -1,3 +1,4 @@
+import asyncio
 import jwt
 import uuid
 import time
@@ -6,6 +7,9 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 from fastapi import HTTPException, status
 from commons.adapters.RedisAdapter import RedisAdapter
+from configuration.RedisConfig import RedisChannelPrefix
+from AuthService.src.ResumeToken import RESUME_TOKEN_TYPE
+from AuthService.src.TokenCache import ExpiringLRUCache, token_digest
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +25,14 @@ class AuthService:
         - Users have to log in again with OAuth provider to get a new session after 24 hours.
     - Token rotation and refresh
     - Anti-abuse rate limiting integration
+    - In-process caches: verified JWT payloads (until "exp") and active sessions (a few
+      seconds, dropped everywhere at once by a pub/sub message when a session is invalidated)
     """
+    # Pub/sub channel carrying the IDs of invalidated sessions to every process
+    SESSION_INVALIDATION_CHANNEL = f"{RedisChannelPrefix.SYSTEM.value}:session_invalidated"
+    # Seconds the invalidation listener waits for a message on an idle channel. Explicit, because
+    # without a timeout redis-py reads with the client's socket_timeout and fails every few seconds.
+    INVALIDATION_IDLE_TIMEOUT = 30.0
     
     def __init__(self, redis_adapter: RedisAdapter, jwt_secret: str):
         self.redis = redis_adapter
@@ -29,6 +40,13 @@ class AuthService:
         self.token_expiry_minutes = 15
         self.guest_token_expiry_minutes = 30
         self.session_expiry_hours = 24 
+        # Verified token digest -> payload; an entry never outlives the token
+        self.token_cache = ExpiringLRUCache(max_entries=10000, default_ttl=self.session_expiry_hours * 3600)
+        # Session ID -> session data, re-read from Redis after session_cache_seconds at the latest
+        self.session_cache_seconds = 30
+        self.session_cache = ExpiringLRUCache(max_entries=10000, default_ttl=self.session_cache_seconds)
+        # Task receiving SESSION_INVALIDATION_CHANNEL messages (started on first session lookup)
+        self._invalidation_listener = None
         
     async def create_session(self, user_id: str, metadata: Dict[str, Any] = None) -> str:
         """
@@ -98,19 +116,28 @@ class AuthService:
         used on every protected API call to verify JWT token is valid.
         """
         try:
-            # Decode and verify JWT signature
-            payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+            # Decode and verify JWT signature (once per token; repeats are served from the cache)
+            digest = token_digest(token)
+            payload = self.token_cache.get(digest)
+            if payload is None:
+                payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+                self.token_cache.put(digest, payload, payload.get("exp"))
+            payload = dict(payload)
             user_id = payload.get("user_id", "unknown")
             token_type = payload.get("type", "access_token")
             
             logger.info(f"🔐 JWT VALIDATION: Token decoded successfully for user {user_id} (type: {token_type})")
+
+            # Websocket resume tokens are only valid for the resume action
+            if token_type == RESUME_TOKEN_TYPE:
+                logger.warning(f"❌ JWT INVALID: Resume token used as bearer token for user {user_id}")
+                return None
             
             # Verify session is still active (for non-guest tokens)
             session_id = payload.get("session_id")
             if session_id:
-                session_key = f"session:{session_id}"
-                session_data = await self.redis.get(session_key)
-                if not session_data or not session_data.get("active"):
+                session_data = await self._get_active_session(session_id)
+                if not session_data:
                     logger.warning(f"❌ JWT INVALID: Token references inactive session: {session_id}")
                     return None
                 logger.info(f"✅ JWT SESSION: Session {session_id} is active for user {user_id}")
@@ -134,11 +161,59 @@ class AuthService:
         session_key = f"session:{session_id}"
         deleted = await self.redis.delete(session_key)
 
+        # Drop cached copies here and in every other process
+        self.session_cache.invalidate(session_id)
+        await self.redis.publish(self.SESSION_INVALIDATION_CHANNEL, session_id)
+
         if deleted:
             logger.info(f"Invalidated session {session_id}")
             return True
         return False    
     
+    async def is_session_active(self, session_id: str) -> bool:
+        """Checks if a session exists and has not been invalidated (logged out)."""
+        return await self._get_active_session(session_id) is not None
+
+    async def _get_active_session(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Session data if the session is active, from the local cache or Redis."""
+        self._ensure_invalidation_listener()
+        session_data = self.session_cache.get(session_id)
+        if session_data is not None:
+            return session_data
+        session_data = await self.redis.get(f"session:{session_id}")
+        if not isinstance(session_data, dict) or not session_data.get("active"):
+            return None
+        self.session_cache.put(session_id, session_data)
+        return session_data
+
+    def _ensure_invalidation_listener(self):
+        if self._invalidation_listener is None or self._invalidation_listener.done():
+            self._invalidation_listener = asyncio.create_task(self._listen_for_invalidations())
+
+    async def _listen_for_invalidations(self):
+        """Drops cached sessions invalidated by any process; resubscribes after connection errors."""
+        while True:
+            pubsub = None
+            try:
+                pubsub = await self.redis.subscribe(self.SESSION_INVALIDATION_CHANNEL)
+                # Invalidations may have been missed while not subscribed
+                self.session_cache.clear()
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=self.INVALIDATION_IDLE_TIMEOUT)
+                    if message and message.get("type") == "message":
+                        self.session_cache.invalidate(message.get("data"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Session invalidation listener error, resubscribing: {e}")
+                await asyncio.sleep(1)
+            finally:
+                if pubsub is not None:
+                    try:
+                        await pubsub.aclose()
+                    except Exception:
+                        pass
+
     async def create_guest_jwt_token(self, user_id: str, game_id: str, player_name: str = None, metadata: Dict[str, Any] = None) -> str:
         """
         Create a limited-scope JWT token for guest players.
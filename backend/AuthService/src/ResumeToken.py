@@ -0,0 +1,42 @@
+import hashlib
+import hmac
+import time
+import jwt
+from typing import Any, Dict, Optional
+
+# Audience of websocket resume tokens; access and guest tokens carry none
+RESUME_AUDIENCE = "queueplay:ws-resume"
+RESUME_TOKEN_TYPE = "resume"
+
+def resume_signing_key(jwt_secret: str, resume_secret: str = None) -> str:
+    """
+    Key for signing resume tokens: RESUME_TOKEN_SECRET if set, otherwise derived from the JWT secret.
+
+    Never the JWT secret itself, so a resume token can not pass as an access token anywhere
+    the JWT secret is used to verify one.
+    """
+    if resume_secret:
+        return resume_secret
+    return hmac.new(jwt_secret.encode('utf-8'), b"queueplay-websocket-resume", hashlib.sha256).hexdigest()
+
+def encode_resume_token(claims: Dict[str, Any], signing_key: str, expires_at: float) -> str:
+    """Signs a resume token with the given claims (client, game, role, session...)."""
+    now = time.time()
+    payload = {
+        **claims,
+        "type": RESUME_TOKEN_TYPE,
+        "aud": RESUME_AUDIENCE,
+        "iat": int(now),
+        "exp": int(expires_at),
+    }
+    return jwt.encode(payload, signing_key, algorithm="HS256")
+
+def decode_resume_token(token: str, signing_key: str) -> Optional[Dict[str, Any]]:
+    """Payload of a valid, unexpired resume token; None otherwise."""
+    try:
+        payload = jwt.decode(token, signing_key, algorithms=["HS256"], audience=RESUME_AUDIENCE)
+    except jwt.InvalidTokenError:
+        return None
+    if payload.get("type") != RESUME_TOKEN_TYPE:
+        return None
+    return payload
@@ -0,0 +1,64 @@
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+def token_digest(token: str) -> str:
+    """Cache key for a token: its SHA-256, so raw bearer tokens are never kept in memory."""
+    return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+class ExpiringLRUCache:
+    """
+    Bounded in-process cache where every entry has its own expiry time.
+
+    Used for verified JWT payloads (an entry never outlives the token's "exp") and for
+    short-lived copies of active sessions. Lookups are O(1); once max_entries is reached the
+    least recently used entry is evicted. Not shared between processes - each keeps its own.
+    """
+
+    def __init__(self, max_entries: int, default_ttl: float):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        # Key -> (expires_at, value), least recently used first
+        self._entries = OrderedDict()
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if time.time() >= expires_at:
+            del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: str, value: Any, expires_at: float = None):
+        """
+        Cache a value until expires_at (epoch seconds), but never longer than default_ttl.
+        """
+        if self.max_entries <= 0:
+            return
+        ttl_limit = time.time() + self.default_ttl
+        expires_at = min(expires_at, ttl_limit) if expires_at else ttl_limit
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -1,3 +1,4 @@
+import asyncio
 import json
 import uuid
 import logging
@@ -10,9 +11,22 @@ from websockets.exceptions import ConnectionClosedOK, ConnectionClosedError
 from typing import Optional, Dict, Any
 
 from MessageService.MessageService import MessageService
+from MessageService.src.MessageEnvelope import MessageEnvelope
+from commons.adapters.SerializerAdapter import SerializerAdapter, SerializationError
+from ConnectionService.src.AdmissionController import AdmissionController, AUTH_TIMEOUT_CLOSE_CODE, AUTH_TIMEOUT_CLOSE_REASON
+from ConnectionService.src.GameStateStore import GameStateStore
+from AuthService.src.ResumeToken import RESUME_TOKEN_TYPE, resume_signing_key, encode_resume_token, decode_resume_token
+from AuthService.src.TokenCache import ExpiringLRUCache, token_digest
+from RateLimitService.src.ConnectionRateLimiter import ConnectionRateLimiter, RATE_LIMIT_CLOSE_CODE, RATE_LIMIT_CLOSE_REASON
+from configuration.RedisConfig import RedisKeyPrefix
+from configuration.RelayConfig import RelayConfig
 
 logger = logging.getLogger(__name__)
 
+# Close code for a connection whose client resumed its session on a newer connection (application-defined range)
+SESSION_RESUMED_CLOSE_CODE = 4002
+SESSION_RESUMED_CLOSE_REASON = "Session resumed elsewhere"
+
 class ConnectionService:
     '''
     Handles WebSocket connections and message relaying via MessageService (Redis Pub/Sub).
@@ -21,28 +35,63 @@ class ConnectionService:
 
     Responsibilities:
     - Manage WebSocket connection lifecycle (connect, disconnect).
-    - Authenticate WebSocket connections using JWT tokens.
+    - Authenticate WebSocket connections using JWT tokens (within the admission deadline).
+    - Rate limit inbound frames per connection (in memory, no Redis round trip).
     - Assign temporary IDs until client identification.
     - Handle client identification and subscribe to appropriate Pub/Sub channels.
-    - Relay subsequent messages to Pub/Sub channels (broadcast or to_host).
+    - Issue resume tokens so a reconnecting client restores its session in one frame.
+    - Relay subsequent messages to Pub/Sub channels (broadcast, to_host, or one player's direct channel).
+    - Version host state patches and send state keyframes to new or lagging clients.
     - Handle disconnection cleanup (unsubscribe from Pub/Sub).
     '''
-    def __init__(self):
+    # Actions the server itself interprets. Frames mentioning any of them skip the
+    # zero-parse relay fast path and go through full JSON handling.
+    CONTROL_ACTIONS = frozenset({"authenticate", "identify", "resume", "statePatch", "setSnapshot", "requestKeyframe"})
+    # Host state updates are sent at the game's tick rate, so they share the host's frame budget
+    # instead of the smaller "control" one
+    STATE_ACTIONS = frozenset({"statePatch", "setSnapshot"})
+    # Field a host sets to address a single player; the frame then goes to that player's
+    # direct channel instead of the broadcast channel
+    TARGET_FIELD = "targetPlayerId"
+
+    def __init__(self, relay_config: RelayConfig = None, serializer: SerializerAdapter = None, server_id: str = None):
         load_dotenv()
         self.messageService: MessageService = None # Injected by MultiplayerServer
+        self.gameStateStore: GameStateStore = None # Injected by MultiplayerServer (state channel enabled)
+        self.admissionController: AdmissionController = None # Injected by MultiplayerServer
+        self.authService = None # Injected by MultiplayerServer (session checks on resume)
+        self.relay_config = relay_config or RelayConfig()
+        self.serializer = serializer or SerializerAdapter()
+        # Quoted control action names, checked with a substring scan instead of a JSON parse
+        self._control_markers = tuple(f'"{action}"' for action in self.CONTROL_ACTIONS)
+        self._target_marker = f'"{self.TARGET_FIELD}"'
+        # Per-connection token buckets for inbound frames (None = unlimited)
+        self.rateLimiter = None
+        if self.relay_config.rate_limit_enabled:
+            self.rateLimiter = ConnectionRateLimiter(
+                self.relay_config.rate_limits,
+                self.relay_config.rate_limit_max_violations,
+                self.relay_config.rate_limit_violation_window
+            )
 
         # Stores websockets for clients connected to THIS server instance
         self.localConnections = {} # {clientId: websocket}
         # Store basic state associated with the *local connection*
         # This is NOT the authoritative game state, just info needed for routing
         self.connectionState = {} # {clientId: {"gameId": str, "isHost": bool, "authenticated": bool}}
+        # Disconnected hosts of this server that may still resume: {clientId: TimerHandle ending the game}
+        self._host_grace_timers = {}
 
         # JWT secret - will be set by the server during initialization
         self.jwt_secret = os.environ.get("JWT_SECRET")
+        # Optional separate key for resume tokens (otherwise derived from the JWT secret)
+        self.resume_secret = os.environ.get("RESUME_TOKEN_SECRET")
+        # Verified token digest -> payload, so reconnecting clients skip the HS256 verify
+        self.tokenCache = ExpiringLRUCache(max_entries=10000, default_ttl=3600)
         # Don't set fallback here - let the server set the correct secret
 
-        # Generate a unique ID for this server instance
-        self.serverId = str(uuid.getnode())[-8:]
+        # Same ID as MessageService and load reporting (unique per process, see MultiplayerServer)
+        self.serverId = server_id or uuid.uuid4().hex[:12]
 
         logger.info(f"ConnectionService initialized with JWT authentication, server ID {self.serverId}")
 
@@ -67,8 +116,14 @@ class ConnectionService:
             if not self.jwt_secret:
                 logger.error("🔑 JWT VALIDATION: No JWT secret available!")
                 return None
-                
-            payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+
+            # Verified once per token until it expires (reconnect storms reuse the same tokens)
+            digest = token_digest(token)
+            payload = self.tokenCache.get(digest)
+            if payload is None:
+                payload = jwt.decode(token, self.jwt_secret, algorithms=["HS256"])
+                self.tokenCache.put(digest, payload, payload.get("exp"))
+            payload = dict(payload)
             
             # Check if token is expired
             exp = payload.get("exp")
@@ -104,6 +159,12 @@ class ConnectionService:
         is_authenticated = False
         user_id = None
         payload = None  # Store JWT payload for later use
+        sender_fields = None  # '"senderId":"<client ID>"', encoded once when identified
+        # Negotiated during the handshake; binary clients send and receive MessagePack frames
+        binary_client = self._is_binary_client(websocket)
+        if self.admissionController:
+            self.admissionController.connection_opened()
+        auth_deadline = self._start_auth_deadline(temp_client_id, websocket)
 
         logger.info(f"Client connected with temporary ID {temp_client_id}. Waiting for JWT authentication (required).")
 
@@ -111,9 +172,35 @@ class ConnectionService:
             # 2. Process messages: Authentication REQUIRED, then identify, then relay
             async for message in websocket:
                 try:
-                    data = json.loads(message)
+                    # --- Relay Fast Path (identified clients, non-control, non-targeted frames) --- #
+                    # Forwards the frame untouched apart from appending senderId; no JSON decode/encode. Only the
+                    # structure is checked (a JSON object's first and last byte), so a malformed object is relayed
+                    # as is and fails to parse on the receiving clients, not here.
+                    if is_identified and self.relay_config.relay_fast_path and isinstance(message, str) \
+                            and not any(marker in message for marker in self._control_markers) \
+                            and not (is_host and self._target_marker in message):
+                        if not self._allow_frame(client_id, "host" if is_host else "player", websocket):
+                            continue
+                        message_to_publish = MessageEnvelope.splice_encoded(message, sender_fields)
+                        if message_to_publish is not message:
+                            await self.messageService.publish_raw(self._relay_channel(game_id, is_host), message_to_publish)
+                            continue
+                        # Not a JSON object: fall through so it gets the usual error handling
+
+                    if binary_client and isinstance(message, bytes):
+                        data = self.serializer.unpack(message)
+                    else:
+                        data = self.serializer.loads(message)
                     action = data.get("action")
 
+                    # Control actions (and anything before identification) share the smaller control budget
+                    if not is_identified or (action in self.CONTROL_ACTIONS and action not in self.STATE_ACTIONS):
+                        rate_class = "control"
+                    else:
+                        rate_class = "host" if is_host else "player"
+                    if not self._allow_frame(client_id, rate_class, websocket):
+                        continue
+
                     # --- Authentication Step (REQUIRED) --- #
                     if action == "authenticate" and not is_authenticated:
                         token = data.get("token")
@@ -124,7 +211,8 @@ class ConnectionService:
 
                         # Validate JWT token
                         token_payload = self.validate_jwt_token(token)
-                        if not token_payload:
+                        # Resume tokens only work with the resume action
+                        if not token_payload or token_payload.get("type") == RESUME_TOKEN_TYPE:
                             logger.warning(f"Invalid token from {temp_client_id}")
                             await self.sendToClient(temp_client_id, {"action": "error", "message": "Invalid or expired JWT token."}, websocket)
                             continue
@@ -139,6 +227,10 @@ class ConnectionService:
                         # Store payload for later use
                         payload = token_payload
                         is_authenticated = True
+                        if auth_deadline:
+                            auth_deadline.cancel()
+                        if self.admissionController:
+                            self.admissionController.connection_authenticated()
                         logger.info(f"Client {temp_client_id} authenticated as user {user_id}")
                         
                         # Acknowledge authentication
@@ -184,29 +276,83 @@ class ConnectionService:
                             "playerName": player_name,
                             "phoneNumber": phone_number,
                             "tokenType": token_type,
-                            "userId": user_id
+                            "userId": user_id,
+                            "joinedAt": time.time()
                         }
                         
                         is_identified = True
+                        sender_fields = MessageEnvelope.encode_fields({"senderId": client_id})
                         logger.info(f"Client identified: {client_id} in game {game_id} as {'host' if is_host else 'player'} (token type: {token_type})")
                         
-                        # Subscribe to game channels
-                        broadcast_channel = f"game:{game_id}:broadcast"
-                        await self.messageService.subscribe_client(client_id, broadcast_channel, websocket)
-                        
-                        if is_host:
-                            host_channel = f"game:{game_id}:to_host"
-                            await self.messageService.subscribe_client(client_id, host_channel, websocket)
-                        
-                        # Notify about successful identification
-                        await self.sendToClient(client_id, {
-                            "action": "identified", 
+                        await self._join_game(client_id, game_id, is_host, websocket, data, {
+                            "action": "identified",
                             "clientId": client_id,
                             "gameId": game_id,
                             "role": role,
                             "authenticated": is_authenticated,
-                            "tokenType": token_type
-                        }, websocket)
+                            "tokenType": token_type,
+                            "resumeToken": self._issue_resume_token(client_id, game_id, role, token_type, player_name, payload)
+                        })
+                        continue
+
+                    # --- Session Resume (replaces authenticate + identify after a reconnect) --- #
+                    elif action == "resume" and not is_identified:
+                        resume_payload = await self._validate_resume_token(data.get("resumeToken"))
+                        if not resume_payload:
+                            await self.sendToClient(temp_client_id, {"action": "error", "message": "Invalid or expired resume token."}, websocket)
+                            continue
+
+                        # A host may only resume while its game has not been ended
+                        if resume_payload.get("role") == "host" and not await self._claim_host_resume(resume_payload["client_id"], resume_payload["game_id"]):
+                            await self.sendToClient(temp_client_id, {"action": "error", "message": "Game has ended, resume not possible."}, websocket)
+                            continue
+
+                        if not is_authenticated:
+                            is_authenticated = True
+                            if auth_deadline:
+                                auth_deadline.cancel()
+                            if self.admissionController:
+                                self.admissionController.connection_authenticated()
+
+                        # Same client ID, game and role as before the disconnect
+                        payload = resume_payload
+                        user_id = resume_payload["user_id"]
+                        client_id = resume_payload["client_id"]
+                        game_id = resume_payload["game_id"]
+                        role = resume_payload.get("role", "player")
+                        is_host = (role == "host")
+                        token_type = resume_payload.get("token_type", "access_token")
+                        player_name = resume_payload.get("player_name")
+
+                        # The old connection may still be open here if the client noticed the drop first
+                        self._take_over_client(client_id, websocket)
+                        previous_state = self.connectionState.get(client_id, {})
+                        del self.localConnections[temp_client_id]
+                        self.localConnections[client_id] = websocket
+                        self.connectionState[client_id] = {
+                            "gameId": game_id,
+                            "isHost": is_host,
+                            "authenticated": is_authenticated,
+                            "playerName": player_name,
+                            "phoneNumber": previous_state.get("phoneNumber"),
+                            "tokenType": token_type,
+                            "userId": user_id,
+                            "joinedAt": time.time()
+                        }
+
+                        is_identified = True
+                        sender_fields = MessageEnvelope.encode_fields({"senderId": client_id})
+                        logger.info(f"Client resumed: {client_id} in game {game_id} as {role} (token type: {token_type})")
+
+                        await self._join_game(client_id, game_id, is_host, websocket, data, {
+                            "action": "resumed",
+                            "clientId": client_id,
+                            "gameId": game_id,
+                            "role": role,
+                            "authenticated": is_authenticated,
+                            "tokenType": token_type,
+                            "resumeToken": self._issue_resume_token(client_id, game_id, role, token_type, player_name, resume_payload)
+                        })
                         continue
 
                     # --- Require Authentication and Identification for All Other Actions --- #
@@ -219,34 +365,53 @@ class ConnectionService:
                         await self.sendToClient(temp_client_id, {"action": "error", "message": "Please identify first with gameId and role."}, websocket)
                         continue
 
+                    # --- State Channel (versioned merge patches + keyframes) --- #
+                    elif action == "statePatch" and self.gameStateStore:
+                        patch = data.get("patch")
+                        if not is_host:
+                            await self.sendToClient(client_id, {"action": "error", "message": "Only the host can publish game state."}, websocket)
+                        elif not isinstance(patch, dict):
+                            await self.sendToClient(client_id, {"action": "error", "message": "statePatch requires a patch object."}, websocket)
+                        else:
+                            await self._publish_state_patch(game_id, client_id, patch)
+                        continue
+                    elif action == "setSnapshot" and self.gameStateStore:
+                        # Replaces the stored room snapshot without broadcasting it
+                        state = data.get("state")
+                        if not is_host:
+                            await self.sendToClient(client_id, {"action": "error", "message": "Only the host can publish game state."}, websocket)
+                        elif not isinstance(state, dict):
+                            await self.sendToClient(client_id, {"action": "error", "message": "setSnapshot requires a state object."}, websocket)
+                        else:
+                            await self.gameStateStore.set_snapshot(game_id, state)
+                        continue
+                    elif action == "requestKeyframe" and self.gameStateStore:
+                        # Sent by a client that detected a gap in patch versions
+                        await self._send_state_keyframe(game_id, client_id)
+                        continue
+
                     # --- Handle Authenticated Client Messages (Relay) --- #
                     else:
                         # Add sender context before relaying
                         data_to_publish = data.copy()
                         data_to_publish["senderId"] = client_id
-                        message_to_publish = json.dumps(data_to_publish)
-                        target_channel = None
-
-                        # Determine target channel based on role stored during identify
-                        if is_host:
-                            # Message from host -> broadcast channel
-                            target_channel = f"game:{game_id}:broadcast"
-                            # logger.debug(f"Host {client_id} broadcasting action '{action}' to {target_channel}")
-                        else:
-                            # Message from player -> to_host channel
-                            target_channel = f"game:{game_id}:to_host"
-                            # logger.debug(f"Player {client_id} sending action '{action}' to {target_channel}")
+                        message_to_publish = self.serializer.dumps(data_to_publish)
 
                         # Publish the raw message via MessageService
-                        if target_channel:
-                            await self.messageService.publish_raw(target_channel, message_to_publish)
+                        # (host -> broadcast or one player's direct channel, player -> to_host)
+                        target_id = data.get(self.TARGET_FIELD) if is_host else None
+                        if target_id and isinstance(target_id, str):
+                            channel = MessageService.direct_channel(game_id, target_id)
                         else:
-                            # Should not happen if identified correctly
-                             logger.error(f"Cannot determine target channel for client {client_id} in game {game_id} with role {is_host}")
+                            channel = self._relay_channel(game_id, is_host)
+                        await self.messageService.publish_raw(channel, message_to_publish)
 
-                except json.JSONDecodeError:
+                except json.JSONDecodeError: # also raised by orjson
                     logger.error(f"Invalid JSON received from client {client_id or temp_client_id}")
                     await self.sendToClient(client_id or temp_client_id, {"action": "error", "message": "Invalid JSON"}, websocket)
+                except SerializationError:
+                    logger.error(f"Invalid MessagePack received from client {client_id or temp_client_id}")
+                    await self.sendToClient(client_id or temp_client_id, {"action": "error", "message": "Invalid MessagePack"}, websocket)
                 except Exception as e:
                     logger.error(f"Error processing message from client {client_id or temp_client_id}: {e}", exc_info=True)
                     try:
@@ -265,48 +430,318 @@ class ConnectionService:
             # 4. Cleanup Connection
             final_client_id = client_id # Use the last known ID (actual or temp)
             logger.info(f"Cleaning up connection for client {final_client_id}")
+            if auth_deadline:
+                auth_deadline.cancel()
+            if self.admissionController:
+                self.admissionController.connection_closed(is_authenticated)
+
+            # A newer connection resumed this client: its subscriptions and state now belong to that one
+            current_websocket = self.localConnections.get(final_client_id)
+            superseded = current_websocket is not None and current_websocket is not websocket
+            if superseded:
+                logger.info(f"Client {final_client_id} was resumed on another connection, keeping its subscriptions")
 
             # Unsubscribe from message service
-            if self.messageService and final_client_id:
+            if self.messageService and final_client_id and not superseded:
                 try:
                     await self.messageService.unsubscribe_client_from_all(final_client_id)
                 except Exception as e:
                     logger.error(f"Error unsubscribing client {final_client_id}: {e}")
 
+            if self.rateLimiter:
+                if not superseded:
+                    self.rateLimiter.forget(final_client_id)
+                self.rateLimiter.forget(temp_client_id)
+
             # Remove from local connections
-            self.localConnections.pop(final_client_id, None)
+            if not superseded:
+                self.localConnections.pop(final_client_id, None)
             self.localConnections.pop(temp_client_id, None)  # Clean up temp ID if still exists
 
             # Remove connection state
-            if final_client_id in self.connectionState:
+            if final_client_id in self.connectionState and not superseded:
                 connection_info = self.connectionState.pop(final_client_id)
                 
-                # If this was a host disconnecting, notify players
+                # If this was a host disconnecting, notify players (the game ends unless the host resumes)
                 if connection_info.get("isHost") and connection_info.get("gameId"):
                     try:
-                        game_id = connection_info["gameId"]
-                        broadcast_channel = f"game:{game_id}:broadcast"
-                        disconnect_message = {
-                            "action": "gameEnded",
-                            "reason": "Host disconnected",
-                            "senderId": "server"
-                        }
-                        await self.messageService.publish_raw(broadcast_channel, json.dumps(disconnect_message))
-                        logger.info(f"Notified players that host {final_client_id} disconnected from game {game_id}")
+                        await self._on_host_disconnected(final_client_id, connection_info["gameId"], connection_info.get("joinedAt", 0))
                     except Exception as e:
                         logger.error(f"Error notifying players of host disconnect: {e}")
 
             logger.info(f"Connection cleanup completed for client {final_client_id}")
 
+    # --- Host Resume Grace --- #
+    # State per host client ID in Redis, shared by all servers (the host may resume on any of them):
+    # {"state": "pending" | "resumed" | "ended", "at": epoch seconds}
+
+    async def _on_host_disconnected(self, client_id: str, game_id: str, joined_at: float):
+        """Ends the host's game, after host_resume_grace if the host can still resume."""
+        grace = self.relay_config.host_resume_grace if self.relay_config.resume_enabled else 0
+        if grace <= 0:
+            await self._end_hosted_game(client_id, game_id)
+            return
+
+        key = self._host_grace_key(client_id)
+        record = await self.messageService.redis.get(key)
+        if isinstance(record, dict) and record.get("state") == "resumed" and record.get("at", 0) > joined_at:
+            logger.info(f"Host {client_id} already resumed elsewhere, game {game_id} continues")
+            return
+
+        await self.messageService.redis.set(key, {"state": "pending", "at": time.time()}, ex=int(grace) + 60)
+        notice = {"action": "hostDisconnected", "resumeWithin": grace, "senderId": "server"}
+        await self.messageService.publish_raw(f"game:{game_id}:broadcast", self.serializer.dumps(notice))
+        logger.info(f"Host {client_id} disconnected from game {game_id}, ending it in {grace}s unless it resumes")
+
+        def expire():
+            self._host_grace_timers.pop(client_id, None)
+            asyncio.create_task(self._expire_host_grace(client_id, game_id))
+
+        previous = self._host_grace_timers.pop(client_id, None)
+        if previous:
+            previous.cancel()
+        self._host_grace_timers[client_id] = asyncio.get_running_loop().call_later(grace, expire)
+
+    async def _expire_host_grace(self, client_id: str, game_id: str):
+        """Grace period over: ends the game unless the host resumed (on any server) meanwhile."""
+        try:
+            key = self._host_grace_key(client_id)
+            record = await self.messageService.redis.get(key)
+            if isinstance(record, dict) and record.get("state") == "resumed":
+                return
+            # Remembered as long as the host's resume tokens can be valid, so they are refused
+            await self.messageService.redis.set(key, {"state": "ended", "at": time.time()}, ex=self.relay_config.resume_token_ttl)
+            await self._end_hosted_game(client_id, game_id)
+        except Exception as e:
+            logger.error(f"Error ending game {game_id} of disconnected host {client_id}: {e}")
+
+    async def _claim_host_resume(self, client_id: str, game_id: str) -> bool:
+        """Cancels a pending game end for a resuming host; False if the game has already ended."""
+        timer = self._host_grace_timers.pop(client_id, None)
+        if timer:
+            timer.cancel()
+        key = self._host_grace_key(client_id)
+        record = await self.messageService.redis.get(key)
+        if isinstance(record, dict) and record.get("state") == "ended":
+            return False
+        ttl = max(int(self.relay_config.host_resume_grace) + 60, 60)
+        await self.messageService.redis.set(key, {"state": "resumed", "at": time.time()}, ex=ttl)
+        if isinstance(record, dict) and record.get("state") == "pending":
+            notice = {"action": "hostResumed", "senderId": "server"}
+            await self.messageService.publish_raw(f"game:{game_id}:broadcast", self.serializer.dumps(notice))
+        return True
+
+    async def _end_hosted_game(self, client_id: str, game_id: str):
+        """Tells the players the game is over and drops its state."""
+        disconnect_message = {
+            "action": "gameEnded",
+            "reason": "Host disconnected",
+            "senderId": "server"
+        }
+        await self.messageService.publish_raw(f"game:{game_id}:broadcast", self.serializer.dumps(disconnect_message))
+        logger.info(f"Notified players that host {client_id} disconnected from game {game_id}")
+        if self.gameStateStore:
+            self.gameStateStore.forget(game_id)
+
+    @staticmethod
+    def _host_grace_key(client_id: str) -> str:
+        return f"{RedisKeyPrefix.HOST_GRACE.value}:{client_id}"
+
     # --- Helper Methods --- #
 
+    def _allow_frame(self, client_id: str, rate_class: str, websocket) -> bool:
+        """
+        Checks an inbound frame against the client's rate limit.
+        Frames over budget are dropped; a client that keeps flooding is disconnected.
+        """
+        if not self.rateLimiter or self.rateLimiter.allow(client_id, rate_class):
+            return True
+        if self.rateLimiter.should_notify(client_id):
+            # Once per burst of dropped frames, not per frame
+            asyncio.create_task(self.sendToClient(client_id, {
+                "action": "rateLimited",
+                "rateClass": rate_class,
+                "message": "Rate limit exceeded, messages are being dropped."
+            }, websocket))
+        if self.rateLimiter.should_disconnect(client_id):
+            logger.warning(f"Closing client {client_id}: rate limit exceeded too often")
+            # Not awaited: the handler keeps draining (and dropping) buffered frames, so the
+            # closing handshake is not stuck behind them
+            asyncio.create_task(websocket.close(RATE_LIMIT_CLOSE_CODE, RATE_LIMIT_CLOSE_REASON))
+        return False
+
+    async def _join_game(self, client_id: str, game_id: str, is_host: bool, websocket, data: dict, ack: dict):
+        """
+        Subscribes an identified (or resumed) client to its game channels and sends the ack.
+        Reconnecting clients may send the last stream offsets they saw in lastOffsets
+        (e.g. {"broadcast": "1700000000000-0"}) to get only the missed messages.
+
+        The client always receives the ack first, then the state keyframe, then live messages.
+        The keyframe is read after subscribing, so no patch falls between the two; patches that
+        were already in the keyframe may still follow it, and clients drop every patch whose
+        version is <= the keyframe's version.
+        """
+        last_offsets = data.get("lastOffsets")
+        is_resuming = isinstance(last_offsets, dict) and bool(last_offsets)
+        # Live messages wait until the ack and keyframe are out
+        self.messageService.hold_client(client_id)
+
+        try:
+            # Subscribe to game channels
+            broadcast_channel = f"game:{game_id}:broadcast"
+            await self.messageService.subscribe_client(client_id, broadcast_channel, websocket)
+
+            if is_host:
+                host_channel = f"game:{game_id}:to_host"
+                await self.messageService.subscribe_client(client_id, host_channel, websocket)
+                # Opt-in: player messages arriving within the window reach the host as one array frame
+                self._configure_host_batching(client_id, host_channel, data)
+
+            # Private messages from the host (targetPlayerId == this client ID)
+            direct_channel = MessageService.direct_channel(game_id, client_id)
+            await self.messageService.subscribe_client(client_id, direct_channel, websocket)
+
+            await self.sendToClient(client_id, ack, websocket)
+
+            # Late joiners and reconnecting clients (host included) get the current room
+            # snapshot as one unicast, instead of the host rebroadcasting it to everyone
+            if self.gameStateStore:
+                await self._send_state_keyframe(game_id, client_id, websocket)
+        finally:
+            # Replays only the gap (nothing without lastOffsets), then releases live messages held meanwhile
+            await self.messageService.replay_to_client(client_id, last_offsets if is_resuming else {})
+
+    def _issue_resume_token(self, client_id: str, game_id: str, role: str, token_type: str,
+                            player_name: Optional[str], auth_payload: dict) -> Optional[str]:
+        """
+        Signs a resume token for an identified client (None if resume is disabled).
+        It expires after resume_token_ttl, and never after the login token it was derived from.
+        The token is signed with its own key and audience, so it is not accepted as an access token.
+        """
+        if not self.relay_config.resume_enabled or not self.jwt_secret:
+            return None
+        auth_exp = auth_payload.get("auth_exp", auth_payload.get("exp"))
+        expires_at = time.time() + self.relay_config.resume_token_ttl
+        if auth_exp:
+            expires_at = min(expires_at, auth_exp)
+        return encode_resume_token({
+            "client_id": client_id,
+            "user_id": auth_payload.get("user_id"),
+            "session_id": auth_payload.get("session_id"),
+            "game_id": game_id,
+            "role": role,
+            "token_type": token_type,
+            "player_name": player_name,
+            "auth_exp": auth_exp,
+        }, resume_signing_key(self.jwt_secret, self.resume_secret), expires_at)
+
+    async def _validate_resume_token(self, token) -> Optional[Dict[str, Any]]:
+        """
+        Returns the payload of a valid resume token, None otherwise.
+        Tokens derived from a session login are only valid while that session is active (not logged out).
+        """
+        if not self.relay_config.resume_enabled or not self.jwt_secret or not isinstance(token, str) or not token:
+            return None
+        payload = decode_resume_token(token, resume_signing_key(self.jwt_secret, self.resume_secret))
+        if not payload or not payload.get("client_id") or not payload.get("game_id") or not payload.get("user_id"):
+            return None
+        session_id = payload.get("session_id")
+        if session_id:
+            if not self.authService:
+                logger.warning(f"Cannot check session for resume of {payload['client_id']}: no AuthService")
+                return None
+            if not await self.authService.is_session_active(session_id):
+                logger.warning(f"Resume token for {payload['client_id']} references inactive session {session_id}")
+                return None
+        return payload
+
+    def _take_over_client(self, client_id: str, websocket):
+        """Closes this client's previous local connection, if it is still open."""
+        old_websocket = self.localConnections.get(client_id)
+        if old_websocket is None or old_websocket is websocket:
+            return
+        logger.info(f"Client {client_id} resumed on a new connection, closing the old one")
+        # Not awaited, for the same reason as the rate limit close
+        asyncio.create_task(old_websocket.close(SESSION_RESUMED_CLOSE_CODE, SESSION_RESUMED_CLOSE_REASON))
+
+    def _start_auth_deadline(self, temp_client_id: str, websocket):
+        """Closes the connection if it has not authenticated within the admission deadline."""
+        if not self.admissionController or self.admissionController.config.auth_timeout <= 0:
+            return None
+
+        def expire():
+            logger.warning(f"Client {temp_client_id} did not authenticate within {self.admissionController.config.auth_timeout}s, closing")
+            self.admissionController.auth_timeouts += 1
+            asyncio.create_task(websocket.close(AUTH_TIMEOUT_CLOSE_CODE, AUTH_TIMEOUT_CLOSE_REASON))
+
+        return asyncio.get_running_loop().call_later(self.admissionController.config.auth_timeout, expire)
+
+    def _configure_host_batching(self, client_id: str, host_channel: str, identify_data: dict):
+        """Enable to_host batching if the host asked for it (batchWindowMs, optional batchMaxSize)."""
+        window_ms = identify_data.get("batchWindowMs")
+        if not self.relay_config.host_batching_enabled or not isinstance(window_ms, (int, float)) or window_ms <= 0:
+            return
+        max_size = identify_data.get("batchMaxSize")
+        if not isinstance(max_size, int) or max_size <= 0:
+            max_size = self.relay_config.host_batch_max_size
+        self.messageService.enable_batching(
+            client_id,
+            host_channel,
+            window=min(window_ms / 1000, self.relay_config.host_batch_max_window),
+            max_messages=min(max_size, self.relay_config.host_batch_max_size)
+        )
+
+    async def _publish_state_patch(self, game_id: str, host_id: str, patch: dict):
+        """
+        Apply a host's merge patch and broadcast it with its version.
+        Every state_keyframe_interval-th version goes out as a full keyframe instead, so clients
+        that silently missed a patch resynchronize without asking.
+        """
+        version, state = await self.gameStateStore.apply_patch(game_id, patch)
+        if self.gameStateStore.is_keyframe_due(version):
+            message = {"action": "stateKeyframe", "version": version, "state": state, "senderId": host_id}
+        else:
+            message = {"action": "statePatch", "version": version, "patch": patch, "senderId": host_id}
+        await self.messageService.publish_raw(f"game:{game_id}:broadcast", self.serializer.dumps(message))
+
+    async def _send_state_keyframe(self, game_id: str, client_id: str, websocket=None):
+        """
+        Send one client the full current state.
+        Directly on the given websocket while its live messages are held (joining clients),
+        otherwise through its direct channel (queued in order with live patches).
+        Clients drop patches whose version is <= the keyframe's version.
+        """
+        snapshot = await self.gameStateStore.get_snapshot(game_id)
+        if snapshot is None:
+            return
+        version, state = snapshot
+        message = {"action": "stateKeyframe", "version": version, "state": state, "senderId": "server"}
+        if websocket is not None:
+            await self.sendToClient(client_id, message, websocket)
+        else:
+            await self.messageService.publish_raw(MessageService.direct_channel(game_id, client_id), self.serializer.dumps(message))
+
+    @staticmethod
+    def _relay_channel(game_id: str, is_host: bool) -> str:
+        """Channel a relayed message goes to, based on the role stored during identify."""
+        if is_host:
+            # Message from host -> broadcast channel
+            return f"game:{game_id}:broadcast"
+        # Message from player -> to_host channel
+        return f"game:{game_id}:to_host"
+
+    @staticmethod
+    def _is_binary_client(websocket) -> bool:
+        """True if the client negotiated the MessagePack subprotocol during the handshake."""
+        return getattr(websocket, "subprotocol", None) == RelayConfig.MSGPACK_SUBPROTOCOL
+
     async def sendToClient(self, client_id, message, websocket=None):
         """
         Send a message to a specific client.
         
         Args:
             client_id: ID of the client to send to
-            message: Message dict to send (will be JSON encoded)
+            message: Message dict to send (JSON encoded, or MessagePack for binary clients)
             websocket: Optional specific websocket to use (for temp connections)
         """
         try:
@@ -321,8 +756,10 @@ class ConnectionService:
                         logger.warning(f"Cannot send message to client {client_id}: connection is closed")
                         return
                     
-                    message_str = json.dumps(message)
-                    await target_ws.send(message_str)
+                    if self._is_binary_client(target_ws):
+                        await target_ws.send(self.serializer.pack(message))
+                    else:
+                        await target_ws.send(self.serializer.dumps(message))
                     logger.debug(f"Sent message to client {client_id}: {message.get('action', 'unknown')}")
                 except websockets.exceptions.ConnectionClosed:
                     logger.warning(f"Cannot send message to client {client_id}: connection closed during send")
@@ -0,0 +1,152 @@
+import asyncio
+import logging
+import time
+from typing import Optional
+from commons.adapters.RedisAdapter import RedisAdapter
+from configuration.AdmissionConfig import AdmissionConfig
+from configuration.RedisConfig import RedisKeyPrefix
+
+logger = logging.getLogger(__name__)
+
+# Close code for connections that did not authenticate in time (application-defined range)
+AUTH_TIMEOUT_CLOSE_CODE = 4001
+AUTH_TIMEOUT_CLOSE_REASON = "Authentication timeout"
+
+class AdmissionController:
+    """
+    Connection admission control and load reporting for one server process.
+
+    Counts open and not-yet-authenticated connections and decides at handshake time whether
+    another one may be accepted. Every load_report_interval the process writes its load to a
+    Redis hash shared by all nodes and reads the others back, so a rejected client can be
+    pointed at the least-loaded node without a Redis round trip during the handshake.
+
+    The caps are checked before the handshake completes, so a burst of concurrent handshakes
+    can overshoot them by the number still in flight.
+    """
+
+    def __init__(self, config: AdmissionConfig, redis: RedisAdapter, server_id: str):
+        self.config = config
+        self.redis = redis
+        self.server_id = server_id
+
+        self.connections = 0
+        self.unauthenticated = 0
+        # Other nodes' latest load reports: server ID -> report dict
+        self.peer_loads = {}
+        self._report_task = None
+
+        # Stats
+        self.rejected = {"connections": 0, "unauthenticated": 0}
+        self.auth_timeouts = 0
+
+    # --- Admission ---
+
+    def check_admission(self) -> Optional[str]:
+        """
+        Decide whether a new connection may be accepted.
+
+        Returns:
+            None to accept, or the name of the exceeded cap ("connections" / "unauthenticated")
+        """
+        if self.config.max_connections and self.connections >= self.config.max_connections:
+            reason = "connections"
+        elif self.config.max_unauthenticated and self.unauthenticated >= self.config.max_unauthenticated:
+            reason = "unauthenticated"
+        else:
+            return None
+        self.rejected[reason] += 1
+        return reason
+
+    def connection_opened(self):
+        self.connections += 1
+        self.unauthenticated += 1
+
+    def connection_authenticated(self):
+        self.unauthenticated -= 1
+
+    def connection_closed(self, authenticated: bool):
+        self.connections -= 1
+        if not authenticated:
+            self.unauthenticated -= 1
+
+    def is_accepting(self) -> bool:
+        return not self.config.max_connections or self.connections < self.config.max_connections
+
+    def utilization(self) -> float:
+        """Fraction of the connection cap in use (0.0 when uncapped)."""
+        if not self.config.max_connections:
+            return 0.0
+        return self.connections / self.config.max_connections
+
+    def redirect_target(self) -> Optional[str]:
+        """Public URL of the least-loaded other node that is accepting connections, if any."""
+        now = time.time()
+        candidates = [
+            load for load in self.peer_loads.values()
+            if load.get("url") and load.get("url") != self.config.public_url
+            and load.get("accepting") and now - load.get("updatedAt", 0) <= self.config.load_stale_after
+        ]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda load: load.get("utilization", 1.0))["url"]
+
+    # --- Load Reporting ---
+
+    def load(self) -> dict:
+        """Current load of this process (served on /load and written to the registry)."""
+        return {
+            "serverId": self.server_id,
+            "url": self.config.public_url,
+            "connections": self.connections,
+            "unauthenticated": self.unauthenticated,
+            "maxConnections": self.config.max_connections,
+            "utilization": round(self.utilization(), 4),
+            "accepting": self.is_accepting(),
+            "updatedAt": time.time(),
+        }
+
+    def stats(self) -> dict:
+        """Current metrics (served on /metrics)."""
+        return {
+            "connections": self.connections,
+            "unauthenticated": self.unauthenticated,
+            "rejected": dict(self.rejected),
+            "authTimeouts": self.auth_timeouts,
+            "peers": len(self.peer_loads),
+        }
+
+    def start(self):
+        """Start reporting load to the registry (inside the running loop)."""
+        if self._report_task is None or self._report_task.done():
+            self._report_task = asyncio.create_task(self._report_loop())
+
+    async def stop(self):
+        """Stop reporting and remove this process from the registry."""
+        task, self._report_task = self._report_task, None
+        if task and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        await self.redis.hdel(RedisKeyPrefix.SERVER_LOAD.value, self.server_id)
+
+    async def _report_loop(self):
+        """Internal: Publishes this process's load and refreshes the peer view."""
+        while True:
+            try:
+                await self.redis.hmset(RedisKeyPrefix.SERVER_LOAD.value, {self.server_id: self.load()})
+                loads = await self.redis.hgetall(RedisKeyPrefix.SERVER_LOAD.value)
+                now = time.time()
+                self.peer_loads = {
+                    server_id: load for server_id, load in loads.items()
+                    if server_id != self.server_id and isinstance(load, dict)
+                    and now - load.get("updatedAt", 0) <= self.config.load_stale_after
+                }
+                stale = [server_id for server_id, load in loads.items()
+                         if isinstance(load, dict) and now - load.get("updatedAt", 0) > 4 * self.config.load_stale_after]
+                if stale:
+                    await self.redis.hdel(RedisKeyPrefix.SERVER_LOAD.value, *stale)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error reporting server load: {e}")
+            await asyncio.sleep(self.config.load_report_interval)
@@ -0,0 +1,134 @@
+import logging
+import weakref
+from websockets import frames
+from websockets.extensions.permessage_deflate import PerMessageDeflate, ServerPerMessageDeflateFactory
+from websockets.exceptions import NegotiationError
+from configuration.WebSocketConfig import WebSocketConfig
+
+logger = logging.getLogger(__name__)
+
+# zlib working memory on top of the window (inflate state, hash tables)
+_INFLATE_OVERHEAD = 7 * 1024
+
+class CompressionStats:
+    """
+    Per-process accounting for permessage-deflate.
+
+    Memory is an estimate from zlib's documented formulas, counted while a connection holds
+    compression contexts and released when its extension object is garbage collected.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.estimated_bytes = 0
+        self.rejected_connections = 0   # served uncompressed because of the memory budget
+        self.messages_compressed = 0
+        self.messages_skipped = 0       # below the size threshold
+        self.bytes_in = 0               # payload bytes of compressed messages, before compression
+        self.bytes_out = 0              # ... and after
+
+    def acquire(self, extension, estimated_bytes: int):
+        """Count a new connection's contexts until the extension object goes away."""
+        self.connections += 1
+        self.estimated_bytes += estimated_bytes
+        weakref.finalize(extension, self.release, estimated_bytes)
+
+    def release(self, estimated_bytes: int):
+        self.connections -= 1
+        self.estimated_bytes -= estimated_bytes
+
+    def snapshot(self) -> dict:
+        """Current metrics (served on /metrics)."""
+        return {
+            "connections": self.connections,
+            "estimatedBytes": self.estimated_bytes,
+            "rejectedConnections": self.rejected_connections,
+            "messagesCompressed": self.messages_compressed,
+            "messagesSkipped": self.messages_skipped,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+        }
+
+# Shared by every connection in this process
+compression_stats = CompressionStats()
+
+class ThresholdPerMessageDeflate(PerMessageDeflate):
+    """
+    permessage-deflate that leaves small messages uncompressed.
+
+    RFC 7692 lets a sender choose per message: a message whose first frame has RSV1 unset is
+    plain, so clients need no changes. Skipped messages never touch the compressor, so the
+    shared LZ77 window only holds the payloads that benefit from it.
+    """
+
+    def __init__(self, *args, min_size: int = 0, stats: CompressionStats = compression_stats, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.min_size = min_size
+        self.stats = stats
+        # Whether the message currently being sent (including its continuation frames) is plain
+        self._skip_message = False
+
+    def encode(self, frame: frames.Frame) -> frames.Frame:
+        if frame.opcode in frames.CTRL_OPCODES:
+            return frame
+        if frame.opcode is not frames.OP_CONT:
+            self._skip_message = len(frame.data) < self.min_size
+            if self._skip_message:
+                self.stats.messages_skipped += 1
+            else:
+                self.stats.messages_compressed += 1
+        if self._skip_message:
+            return frame
+        encoded = super().encode(frame)
+        self.stats.bytes_in += len(frame.data)
+        self.stats.bytes_out += len(encoded.data)
+        return encoded
+
+class ThresholdPerMessageDeflateFactory(ServerPerMessageDeflateFactory):
+    """
+    Server-side negotiation for ThresholdPerMessageDeflate, configured from WebSocketConfig.
+
+    When accepting another compressed connection would push the process past the configured
+    memory budget, negotiation is declined and that client simply runs uncompressed.
+    """
+
+    def __init__(self, config: WebSocketConfig, stats: CompressionStats = compression_stats):
+        super().__init__(
+            server_no_context_takeover=config.server_no_context_takeover,
+            server_max_window_bits=config.server_max_window_bits,
+            client_max_window_bits=config.client_max_window_bits,
+            compress_settings=config.get_compress_settings(),
+        )
+        self.min_size = config.compression_min_size
+        self.memory_level = config.memory_level
+        self.memory_budget = config.compression_memory_budget
+        self.stats = stats
+
+    def process_request_params(self, params, accepted_extensions):
+        response_params, extension = super().process_request_params(params, accepted_extensions)
+
+        estimated_bytes = self.estimate_memory(extension)
+        if self.memory_budget and self.stats.estimated_bytes + estimated_bytes > self.memory_budget:
+            self.stats.rejected_connections += 1
+            logger.warning(f"Compression memory budget reached ({self.stats.estimated_bytes} bytes), serving connection uncompressed")
+            raise NegotiationError("compression memory budget exhausted")
+
+        threshold_extension = ThresholdPerMessageDeflate(
+            extension.remote_no_context_takeover,
+            extension.local_no_context_takeover,
+            extension.remote_max_window_bits,
+            extension.local_max_window_bits,
+            self.compress_settings,
+            min_size=self.min_size,
+            stats=self.stats,
+        )
+        self.stats.acquire(threshold_extension, estimated_bytes)
+        return response_params, threshold_extension
+
+    def estimate_memory(self, extension: PerMessageDeflate) -> int:
+        """Bytes held between messages by the negotiated contexts (zlib's documented sizes)."""
+        total = 0
+        if not extension.local_no_context_takeover:
+            total += (1 << (extension.local_max_window_bits + 2)) + (1 << (self.memory_level + 9))
+        if not extension.remote_no_context_takeover:
+            total += (1 << extension.remote_max_window_bits) + _INFLATE_OVERHEAD
+        return total
@@ -0,0 +1,107 @@
+import logging
+from typing import Optional, Tuple
+from commons.adapters.RedisAdapter import RedisAdapter
+from configuration.RedisConfig import RedisKeyPrefix
+from configuration.RelayConfig import RelayConfig
+
+logger = logging.getLogger(__name__)
+
+def merge_patch(target, patch):
+    """
+    Apply a JSON merge patch (RFC 7386) and return the result.
+
+    Objects are merged key by key, null deletes a key, anything else (including arrays)
+    replaces the old value. The target is not modified.
+    """
+    if not isinstance(patch, dict):
+        return patch
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+class GameStateStore:
+    """
+    Versioned per-game state snapshots for the relay-level state channel.
+
+    The host sends merge patches (each bumps the game's version) or replaces the whole snapshot
+    (same version, nothing is broadcast); the full snapshot is written to Redis, so any server can hand a keyframe to a new,
+    reconnecting or lagging client. The host's server also keeps the latest snapshot in memory,
+    so applying a patch needs no Redis read. Patches from one host are applied in order (one
+    connection handler per host).
+    """
+
+    def __init__(self, redis: RedisAdapter, relay_config: RelayConfig = None):
+        self.redis = redis
+        self.relay_config = relay_config or RelayConfig()
+        # Game ID -> (version, state) for games whose host is connected to this server
+        self._snapshots = {}
+
+    async def apply_patch(self, game_id: str, patch: dict) -> Tuple[int, dict]:
+        """
+        Merge a patch into the game's state and persist the new snapshot.
+
+        Returns:
+            (version, state) after the patch
+        """
+        version, state = await self._load(game_id)
+        state = merge_patch(state, patch)
+        await self._store(game_id, version + 1, state)
+        return version + 1, state
+
+    async def set_snapshot(self, game_id: str, state: dict) -> int:
+        """
+        Replace the game's state with a full snapshot (nothing is broadcast).
+
+        The version stays the same: connected clients never see this version, so bumping it
+        would look like a missed patch and make every one of them request a keyframe.
+        A snapshot set before any patch has version 0.
+
+        Returns:
+            The snapshot's version
+        """
+        version, _ = await self._load(game_id)
+        await self._store(game_id, version, state)
+        return version
+
+    async def get_snapshot(self, game_id: str) -> Optional[Tuple[int, dict]]:
+        """Latest (version, state) of a game, or None if its host never published state."""
+        version, state = await self._load(game_id)
+        if version == 0 and not state:
+            return None
+        return version, state
+
+    def forget(self, game_id: str):
+        """Drop the in-memory copy (host left this server); the Redis snapshot stays until its TTL."""
+        self._snapshots.pop(game_id, None)
+
+    def is_keyframe_due(self, version: int) -> bool:
+        """Checks if this version should be broadcast as a full keyframe instead of a patch."""
+        interval = self.relay_config.state_keyframe_interval
+        return interval > 0 and version % interval == 0
+
+    async def _store(self, game_id: str, version: int, state: dict):
+        """Internal: Caches and persists a snapshot (refreshing its TTL)."""
+        self._snapshots[game_id] = (version, state)
+        await self.redis.set(
+            self._key(game_id),
+            {"version": version, "state": state},
+            ex=self.relay_config.state_ttl
+        )
+
+    async def _load(self, game_id: str) -> Tuple[int, dict]:
+        """Internal: Returns the cached snapshot, falling back to Redis (e.g. host reconnected here)."""
+        cached = self._snapshots.get(game_id)
+        if cached is not None:
+            return cached
+        stored = await self.redis.get(self._key(game_id))
+        if isinstance(stored, dict) and isinstance(stored.get("state"), dict):
+            return int(stored.get("version", 0)), stored["state"]
+        return 0, {}
+
+    @staticmethod
+    def _key(game_id: str) -> str:
+        return f"{RedisKeyPrefix.GAME_STATE.value}:{game_id}"
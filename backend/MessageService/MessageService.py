@@ -1,17 +1,69 @@
-import json
 import logging
 import asyncio
 import time
+import uuid
 from collections import defaultdict
 from configuration.RedisConfig import RedisKeyPrefix, RedisChannelPrefix
+from configuration.RelayConfig import RelayConfig
 from commons.enums.Stage import Stage
 from commons.adapters.RedisAdapter import RedisAdapter
+from MessageService.src.CallbackDispatcher import CallbackDispatcher
+from MessageService.src.ChannelSequencer import ChannelSequencer, SequenceStats
+from MessageService.src.ClientOutbox import ClientOutbox
+from MessageService.src.MessageEnvelope import MessageEnvelope
 from websockets.server import WebSocketServerProtocol
-from websockets.exceptions import ConnectionClosed
 from websockets.connection import State
 
 logger = logging.getLogger(__name__)
 
+# Lua counterpart of MessageEnvelope.splice_fields: appends encoded fields to a JSON object
+_LUA_SPLICE = """
+local function splice(msg, fields)
+    if string.sub(msg, 1, 1) ~= '{' or string.sub(msg, -1) ~= '}' then
+        return msg
+    end
+    if string.find(msg, '^{%s*}$') then
+        return '{' .. fields .. '}'
+    end
+    return string.sub(msg, 1, -2) .. ',' .. fields .. '}'
+end
+"""
+
+# Atomically stamps the channel's next sequence number onto a message and publishes it.
+# "seqChannel" names the counter: one socket can receive several sequenced channels
+# (a host gets broadcast and to_host), and numbers only follow on within one of them.
+# KEYS[1] = sequence key
+# ARGV = [message, ttl seconds, pub/sub channel, sequence name]
+# Returns the published message
+SEQUENCED_PUBLISH_SCRIPT = _LUA_SPLICE + """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local msg = splice(ARGV[1], '"seq":' .. seq .. ',"seqChannel":"' .. ARGV[4] .. '"')
+redis.call('PUBLISH', ARGV[3], msg)
+return msg
+"""
+
+# Atomically appends a game message to its capped stream and publishes it with the new
+# stream offset spliced onto the end of the JSON object (same format as MessageEnvelope).
+# With a sequence key, the next sequence number is stamped on first (and stored in the stream),
+# named after the stream like in SEQUENCED_PUBLISH_SCRIPT.
+# KEYS[1] = stream key, KEYS[2] = sequence key (optional)
+# ARGV = [message, stream name, maxlen, ttl seconds, pub/sub channel, sequence ttl seconds]
+# Returns the published message
+STREAM_PUBLISH_SCRIPT = _LUA_SPLICE + """
+local msg = ARGV[1]
+if KEYS[2] then
+    local seq = redis.call('INCR', KEYS[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[6])
+    msg = splice(msg, '"seq":' .. seq .. ',"seqChannel":"' .. ARGV[2] .. '"')
+end
+local id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[3], '*', 'm', msg)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+msg = splice(msg, '"stream":"' .. ARGV[2] .. '","offset":"' .. id .. '"')
+redis.call('PUBLISH', ARGV[5], msg)
+return msg
+"""
+
 class MessageService:
     """
     Service for handling pub/sub messaging between servers using Redis.
@@ -26,33 +78,87 @@ class MessageService:
     servers that need to know.
     """
 
-    def __init__(self, redis: RedisAdapter):
+    def __init__(self, redis: RedisAdapter, relay_config: RelayConfig = None, server_id: str = None):
         """
         Initialize MessageService
 
         Args:
             redis: RedisAdapter instance for pub/sub operations
+            relay_config: Relay tuning options (defaults loaded from environment)
+            server_id: This process's server ID (generated if not given); must be unique per process
         """
         if not redis:
             raise ValueError("Redis adapter is required for MessageService")
         self.redis = redis
+        self.relay_config = relay_config or RelayConfig()
+        # Same serializer the adapter uses for Redis values
+        self.serializer = redis.serializer
+
+        # Unique per process (several workers on one host must not share it); stamped on every
+        # published message so this process can skip its own messages when Redis echoes them back
+        self.server_id = server_id or uuid.uuid4().hex[:12]
+        self._origin_fields = MessageEnvelope.encode_fields({"origin": self.server_id})
 
         # --- Server-side Callback Subscriptions ---
         self.server_callbacks = defaultdict(list) # Channel -> List of async server callback functions
 
         # --- Client WebSocket Subscriptions ---
+        # Runs server callbacks off the listener (bounded queues, per-channel order)
+        self.callback_dispatcher = CallbackDispatcher(self.relay_config.callback_workers, self.relay_config.callback_queue_size)
         # Maps channel -> set of locally connected client IDs subscribed to it
         self.channel_to_clients = defaultdict(set)
         # Maps client ID -> set of channels the client is subscribed to
         self.client_to_channels = defaultdict(set)
         # Maps client ID -> active WebSocket connection object
         self.client_websockets = {}
+        # Maps client ID -> bounded outbound queue + writer task for that websocket
+        self.client_outboxes = {}
+        # Clients disconnected for falling behind (lifetime counter)
+        self.slow_consumer_evictions = 0
+        # Client ID -> messages buffered while the client's missed messages are replayed
+        self._held_messages = {}
+        # Client ID -> channels whose messages are coalesced into array frames for that client
+        self._batched_channels = {}
+        # Lazily registered STREAM_PUBLISH_SCRIPT (streams channel backend only)
+        self._stream_publish_script = None
+        # Lazily registered SEQUENCED_PUBLISH_SCRIPT (ordered delivery, pub/sub backend)
+        self._sequenced_publish_script = None
+        # Channel -> ChannelSequencer (reorder buffer) for subscribed sequenced channels
+        self._sequencers = {}
+        self.sequence_stats = SequenceStats()
+
+        # Quoted action names used to cheaply pre-filter messages before checking for conflation
+        # (bytes, since payloads arrive from Redis undecoded)
+        self._conflation_markers = tuple(f'"{action}"'.encode('utf-8') for action in self.relay_config.conflate_actions)
 
         # --- Redis PubSub Management ---
-        # Maps channel -> active aioredis PubSub object (shared by callbacks & clients)
-        self.pubsubs = {}
-        # Maps channel -> active listener task for the PubSub object
-        self.listener_tasks = {}
+        # One PubSub object (one Redis connection) per process, shared by every channel.
+        # Channels are added/removed on it dynamically as local subscribers come and go.
+        self.pubsub = None
+        # Single reader task that routes every incoming message by its channel name
+        self.listener_task = None
+        # Channels currently subscribed on the shared PubSub
+        self.subscribed_channels = set()
+        # Raw channel name as delivered by the (non-decoding) PubSub -> channel name
+        self._channel_keys = {}
+        # Serializes subscribe/unsubscribe commands on the shared PubSub connection
+        self._pubsub_lock = asyncio.Lock()
+        # Channel -> TimerHandle for unused channels kept subscribed during the linger period
+        self._lingering_channels = {}
+        # SUBSCRIBE/UNSUBSCRIBE commands sent to Redis, and pairs of them saved by reusing a
+        # lingering channel (lifetime counters)
+        self.subscribe_count = 0
+        self.unsubscribe_count = 0
+        self.subscribes_avoided = 0
+        self.unsubscribes_avoided = 0
+
+        # --- Closed Socket Cleanup ---
+        # Client IDs whose websockets were found closed during fan-out, cleaned up in one batch
+        self._pending_cleanup = set()
+        # Channels whose linger period ran out, unsubscribed by the same cleanup task
+        self._expired_channels = set()
+        # Single task draining _pending_cleanup and _expired_channels (never one task per socket/channel)
+        self._cleanup_task = None
 
         logger.info("MessageService initialized")
 
@@ -68,23 +174,45 @@ class MessageService:
         Stop the message service, cancel listeners, and clean up PubSub objects.
         """
         logger.info("Stopping MessageService...")
-        # Cancel all listener tasks
-        listener_stop_tasks = []
-        for channel, task in list(self.listener_tasks.items()): # Iterate over copy
-            if task and not task.done():
-                task.cancel()
-                listener_stop_tasks.append(task)
-            # Clean up immediately to prevent race conditions during shutdown
-            self.pubsubs.pop(channel, None)
-            self.listener_tasks.pop(channel, None)
-
-        if listener_stop_tasks:
-            await asyncio.gather(*listener_stop_tasks, return_exceptions=True)
-            logger.info(f"Cancelled {len(listener_stop_tasks)} listener tasks.")
-
-        # Pubsubs should be closed by cancelling tasks / RedisAdapter closing
-        self.pubsubs = {}
-        self.listener_tasks = {}
+        # Cancel the shared listener task
+        task = self.listener_task
+        self.listener_task = None
+        if task and not task.done():
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            logger.info("Cancelled shared pub/sub listener task.")
+
+        # Close the shared PubSub connection
+        pubsub = self.pubsub
+        self.pubsub = None
+        if pubsub:
+            try:
+                await pubsub.aclose()
+            except Exception as e:
+                logger.error(f"Error closing shared PubSub: {e}")
+
+        self.subscribed_channels = set()
+        self._channel_keys = {}
+        for handle in self._lingering_channels.values():
+            handle.cancel()
+        self._lingering_channels.clear()
+        for channel in list(self._sequencers):
+            self._stop_sequencer(channel)
+
+        cleanup_task = self._cleanup_task
+        self._cleanup_task = None
+        if cleanup_task and not cleanup_task.done():
+            cleanup_task.cancel()
+            await asyncio.gather(cleanup_task, return_exceptions=True)
+        self._pending_cleanup.clear()
+        self._expired_channels.clear()
+
+        await self.callback_dispatcher.stop()
+
+        for outbox in self.client_outboxes.values():
+            outbox.close()
+        self.client_outboxes.clear()
+
         self.channel_to_clients.clear()
         self.client_to_channels.clear()
         self.client_websockets.clear()
@@ -106,6 +234,7 @@ class MessageService:
         if not callable(callback):
             raise ValueError("Callback must be a callable function")
 
+        self._reuse_lingering_channel(channel)
         is_new_channel_subscription = not self._is_channel_subscribed(channel)
         self.server_callbacks[channel].append(callback)
 
@@ -150,11 +279,13 @@ class MessageService:
             logger.error(f"Invalid arguments for subscribe_client: client='{client_id}', channel='{channel}', ws={websocket}")
             return
 
+        self._reuse_lingering_channel(channel)
         is_new_channel_subscription = not self._is_channel_subscribed(channel)
 
         self.channel_to_clients[channel].add(client_id)
         self.client_to_channels[client_id].add(channel)
         self.client_websockets[client_id] = websocket
+        self._ensure_outbox(client_id, websocket)
 
         if is_new_channel_subscription:
             await self._subscribe_to_channel_if_needed(channel)
@@ -195,6 +326,9 @@ class MessageService:
 
         channels = list(self.client_to_channels.pop(client_id, set())) # Get channels and remove client entry
         self.client_websockets.pop(client_id, None) # Remove websocket reference
+        self._held_messages.pop(client_id, None)
+        self._batched_channels.pop(client_id, None)
+        self._close_outbox(client_id)
 
         unsubscribe_tasks = []
         for channel in channels:
@@ -207,6 +341,92 @@ class MessageService:
 
         logger.info(f"Unsubscribed client {client_id} from all channels: {channels}")
 
+    # --- Outbound Queues ---
+
+    def _ensure_outbox(self, client_id: str, websocket: WebSocketServerProtocol):
+        """Internal: Creates the client's outbound queue, replacing it if the websocket changed."""
+        outbox = self.client_outboxes.get(client_id)
+        if outbox and outbox.websocket is websocket and not outbox.closed:
+            return outbox
+        if outbox:
+            # New connection for the same client (session resume): batching is set up again per outbox
+            self._close_outbox(client_id)
+            self._batched_channels.pop(client_id, None)
+        config = self.relay_config
+        outbox = ClientOutbox(
+            client_id,
+            websocket,
+            max_depth=config.outbox_max_depth,
+            max_bytes=config.outbox_max_bytes,
+            max_lag=config.outbox_max_lag,
+            binary=getattr(websocket, "subprotocol", None) == RelayConfig.MSGPACK_SUBPROTOCOL
+        )
+        self.client_outboxes[client_id] = outbox
+        return outbox
+
+    def enable_batching(self, client_id: str, channel: str, window: float, max_messages: int):
+        """
+        Coalesce a subscribed client's messages from one channel into array frames
+        (e.g. players' answers on to_host for a host on a slow device).
+
+        Args:
+            client_id: Subscribed client
+            channel: Channel whose messages may be batched
+            window: Seconds the first message of a batch may wait for more
+            max_messages: Maximum messages per frame
+        """
+        outbox = self.client_outboxes.get(client_id)
+        if outbox is None:
+            return
+        joiner = self.serializer.msgpack_array if outbox.binary else MessageEnvelope.join_array
+        outbox.enable_batching(window, max_messages, joiner)
+        self._batched_channels.setdefault(client_id, set()).add(channel)
+        logger.info(f"Batching {channel} for client {client_id} ({window * 1000:.0f}ms window, max {max_messages})")
+
+    def _close_outbox(self, client_id: str):
+        """Internal: Stops the client's writer task and drops its queue."""
+        outbox = self.client_outboxes.pop(client_id, None)
+        if outbox:
+            if outbox.evicted:
+                self.slow_consumer_evictions += 1
+            outbox.close()
+
+    def get_metrics(self) -> dict:
+        """
+        Snapshot of relay metrics for this process (exposed over HTTP by MultiplayerServer).
+
+        Returns:
+            Dict with channel/client counts and outbound queue depth/bytes
+        """
+        depths = [outbox.depth for outbox in self.client_outboxes.values()]
+        return {
+            "channels": len(self.subscribed_channels),
+            "clients": len(self.client_outboxes),
+            "outbox": {
+                "queuedMessages": sum(depths),
+                "queuedBytes": sum(outbox.queued_bytes for outbox in self.client_outboxes.values()),
+                "maxDepth": max(depths, default=0),
+                "limits": {
+                    "maxDepth": self.relay_config.outbox_max_depth,
+                    "maxBytes": self.relay_config.outbox_max_bytes,
+                    "maxLag": self.relay_config.outbox_max_lag,
+                },
+            },
+            "conflatedMessages": sum(outbox.conflated_count for outbox in self.client_outboxes.values()),
+            "ordering": self.sequence_stats.snapshot(),
+            "subscriptions": {
+                "subscribes": self.subscribe_count,
+                "unsubscribes": self.unsubscribe_count,
+                "lingering": len(self._lingering_channels),
+                "subscribesAvoided": self.subscribes_avoided,
+                "unsubscribesAvoided": self.unsubscribes_avoided,
+            },
+            "callbacks": self.callback_dispatcher.stats(),
+            "batchedFrames": sum(outbox.batched_frames for outbox in self.client_outboxes.values()),
+            "slowConsumerEvictions": self.slow_consumer_evictions
+                + sum(1 for outbox in self.client_outboxes.values() if outbox.evicted),
+        }
+
     # --- Publishing Methods ---
 
     async def publish_raw(self, channel: str, message: str):
@@ -214,6 +434,18 @@ class MessageService:
         Publish a raw string message to a channel.
         (Renamed from publish to clarify it sends raw data)
 
+        Local subscribers on this server get the message directly; Redis is only used to
+        reach other servers. The message is stamped with this server's ID so the copy that
+        comes back through Redis is not delivered twice; the stamp is removed again before the message
+        reaches clients. A direct (single-client) channel whose
+        client is connected here is not published to Redis at all.
+
+        Game channels (except direct ones) are sequenced: Redis stamps a per-channel "seq" that
+        increases by one per message, and every server delivers them to clients in that order.
+        "seqChannel" (e.g. "broadcast", "to_host") says which channel's counter it is, so clients
+        track gaps per seqChannel. A gap is not always loss: conflation (conflate_actions) drops
+        superseded messages from a client's queue on purpose, and their numbers are never delivered.
+
         Args:
             channel: Channel to publish to
             message: Message to publish (string)
@@ -222,8 +454,32 @@ class MessageService:
             True if published successfully, False otherwise
         """
         try:
+            stamped = MessageEnvelope.splice_encoded(message, self._origin_fields)
+            # Only stamped (JSON object) messages can be recognised on the way back from Redis.
+            # A lingering channel has no local subscribers, but its echo is dropped all the same:
+            # it goes through local delivery too, so its sequencer keeps up for a returning subscriber.
+            in_use = self._is_channel_in_use(channel)
+            deliver_locally = (self.relay_config.local_delivery and stamped is not message
+                               and (in_use or channel in self._lingering_channels))
+
+            if self._uses_stream(channel):
+                published = await self._publish_to_stream(channel, stamped)
+                if deliver_locally:
+                    self._deliver_in_order(channel, published.encode('utf-8'))
+                return True
+
+            if self._uses_sequence(channel):
+                published = await self._publish_sequenced(channel, stamped)
+                if deliver_locally:
+                    self._deliver_in_order(channel, published.encode('utf-8'))
+                return True
+
+            if deliver_locally:
+                self._dispatch_message(channel, stamped.encode('utf-8'))
+                if in_use and self.is_direct_channel(channel):
+                    return True # Its only subscriber is connected to this server
             # Use the RedisAdapter's publish method directly
-            await self.redis.publish(channel, message)
+            await self.redis.publish(channel, stamped)
             # logger.debug(f"Published raw message to channel {channel}: {message[:100]}...")
             return True
         except Exception as e:
@@ -259,17 +515,219 @@ class MessageService:
             "timestamp": int(time.time())
         }
         try:
-            message_str = json.dumps(message)
+            message_str = self.serializer.dumps(message)
             return await self.publish_raw(channel, message_str)
-        except json.JSONDecodeError as e:
+        except (TypeError, ValueError) as e:
             logger.error(f"Error encoding event message for {event_type}: {e}")
             return False
 
+    # --- Direct Channels ---
+
+    @staticmethod
+    def direct_channel(game_id: str, client_id: str) -> str:
+        """Channel only one client subscribes to, e.g. game:123:to:auth_u1_ab12cd34."""
+        return f"{RedisChannelPrefix.GAME.value}:{game_id}:to:{client_id}"
+
+    @staticmethod
+    def is_direct_channel(channel: str) -> bool:
+        """Checks if a channel is a single-client channel created by direct_channel()."""
+        parts = channel.split(":", 3)
+        return len(parts) == 4 and parts[0] == RedisChannelPrefix.GAME.value and parts[2] == "to"
+
+    # --- Stream Backend (resume from offset) ---
+
+    def _uses_stream(self, channel: str) -> bool:
+        """
+        Checks if a channel is a per-game channel backed by a Redis Stream.
+        Direct channels are not: client IDs change on reconnect, so there is nothing to resume.
+        """
+        return (self.relay_config.channel_backend == "streams"
+                and channel.startswith(f"{RedisChannelPrefix.GAME.value}:")
+                and channel.count(":") >= 2
+                and not self.is_direct_channel(channel))
+
+    @staticmethod
+    def _stream_name(channel: str) -> str:
+        """Short stream name clients use for offsets, e.g. game:123:broadcast -> broadcast."""
+        return channel.split(":", 2)[2]
+
+    @staticmethod
+    def _stream_key(channel: str) -> str:
+        return f"{RedisKeyPrefix.STREAM.value}:{channel}"
+
+    async def _publish_to_stream(self, channel: str, message: str) -> str:
+        """Internal: [INCR +] XADD (capped) + PUBLISH with seq/offset stamped on, in one atomic script call."""
+        if self._stream_publish_script is None:
+            self._stream_publish_script = await self.redis.register_script(STREAM_PUBLISH_SCRIPT)
+        keys = [self._stream_key(channel)]
+        if self._uses_sequence(channel):
+            keys.append(self._sequence_key(channel))
+        return await self._stream_publish_script(
+            keys=keys,
+            args=[message.strip(), self._stream_name(channel), self.relay_config.stream_maxlen,
+                  self.relay_config.stream_ttl, channel, self.relay_config.sequence_ttl]
+        )
+
+    # --- Ordered Delivery (per-channel sequence numbers) ---
+
+    def _uses_sequence(self, channel: str) -> bool:
+        """
+        Checks if a channel's messages carry a Redis-assigned sequence number.
+        Direct channels do not: they have one subscriber and one publishing connection.
+        """
+        return (self.relay_config.ordered_delivery
+                and channel.startswith(f"{RedisChannelPrefix.GAME.value}:")
+                and channel.count(":") >= 2
+                and not self.is_direct_channel(channel))
+
+    @staticmethod
+    def _sequence_key(channel: str) -> str:
+        return f"{RedisKeyPrefix.SEQUENCE.value}:{channel}"
+
+    async def _publish_sequenced(self, channel: str, message: str) -> str:
+        """Internal: INCR + PUBLISH with the sequence number stamped on, in one atomic script call."""
+        if self._sequenced_publish_script is None:
+            self._sequenced_publish_script = await self.redis.register_script(SEQUENCED_PUBLISH_SCRIPT)
+        return await self._sequenced_publish_script(
+            keys=[self._sequence_key(channel)],
+            args=[message.strip(), self.relay_config.sequence_ttl, channel, self._stream_name(channel)]
+        )
+
+    async def _start_sequencer(self, channel: str):
+        """
+        Internal: Creates the channel's reorder buffer, expecting the number after the current counter.
+        Read before subscribing, so anything published in between shows up as a (timed out) gap
+        rather than being mistaken for a duplicate.
+        """
+        current = await self.redis.get(self._sequence_key(channel))
+        try:
+            next_seq = int(current) + 1 if current is not None else 1
+        except (TypeError, ValueError):
+            next_seq = 1
+        self._sequencers[channel] = ChannelSequencer(next_seq, self.relay_config.reorder_max_pending, self.sequence_stats)
+
+    def _stop_sequencer(self, channel: str):
+        sequencer = self._sequencers.pop(channel, None)
+        if sequencer and sequencer.gap_timer:
+            sequencer.gap_timer.cancel()
+
+    def _deliver_in_order(self, channel: str, payload: bytes):
+        """
+        Internal: Dispatches a message, holding back sequenced messages that arrive early.
+
+        Dispatch never awaits, so concurrent deliveries (local publishes, the listener, gap
+        timeouts) cannot interleave the messages released here.
+        """
+        sequencer = self._sequencers.get(channel)
+        seq = MessageEnvelope.read_sequence(payload) if sequencer is not None else None
+        if seq is None:
+            self._dispatch_message(channel, payload)
+            return
+
+        ready = sequencer.accept(seq, payload)
+        self._update_gap_timer(channel, sequencer)
+        for message in ready:
+            self._dispatch_message(channel, message)
+
+    def _update_gap_timer(self, channel: str, sequencer: ChannelSequencer):
+        """Internal: Arms the gap timeout while messages are held back, disarms it otherwise."""
+        if sequencer.pending and sequencer.gap_timer is None:
+            sequencer.gap_timer = asyncio.get_running_loop().call_later(
+                self.relay_config.reorder_timeout, self._on_sequence_gap_timeout, channel)
+        elif not sequencer.pending and sequencer.gap_timer is not None:
+            sequencer.gap_timer.cancel()
+            sequencer.gap_timer = None
+
+    def _on_sequence_gap_timeout(self, channel: str):
+        """Internal: The missing message(s) never came; release what is held so clients can move on."""
+        sequencer = self._sequencers.get(channel)
+        if sequencer is None:
+            return
+        sequencer.gap_timer = None
+        missing_from = sequencer.next_seq
+        ready = sequencer.skip_gap()
+        logger.warning(f"Sequence gap on {channel}: skipped {sequencer.next_seq - len(ready) - missing_from} message(s) from seq {missing_from}")
+        self._update_gap_timer(channel, sequencer)
+        for message in ready:
+            self._dispatch_message(channel, message)
+
+    def hold_client(self, client_id: str):
+        """
+        Start buffering live messages for a client instead of queueing them.
+        Call before subscribing a joining or reconnecting client, then replay_to_client() to flush
+        (with no offsets it only releases the held messages).
+        """
+        self._held_messages.setdefault(client_id, [])
+
+    async def replay_to_client(self, client_id: str, last_offsets: dict) -> int:
+        """
+        Send a reconnecting client the messages it missed, then release held live messages.
+
+        Only the gap after each given offset is read (bounded by the stream's MAXLEN), so the cost
+        depends on how long the client was away, not on the size of the game state. Live messages
+        that arrived during the replay and were already replayed are dropped as duplicates.
+
+        Args:
+            client_id: Client to replay to (must already be subscribed)
+            last_offsets: Stream name -> last offset the client saw, e.g. {"broadcast": "1700000000000-0"}
+
+        Returns:
+            Number of replayed messages
+        """
+        replayed = []  # (channel, message)
+        replayed_upto = {}  # stream name -> highest replayed offset tuple
+        truncated = []
+        try:
+            if self.relay_config.channel_backend == "streams" and isinstance(last_offsets, dict):
+                for channel in list(self.client_to_channels.get(client_id, ())):
+                    if not self._uses_stream(channel):
+                        continue
+                    name = self._stream_name(channel)
+                    last_offset = last_offsets.get(name)
+                    last_id = MessageEnvelope.parse_stream_id(last_offset)
+                    if last_id is None:
+                        continue
+
+                    stream_key = self._stream_key(channel)
+                    oldest = await self.redis.xrange(stream_key, count=1)
+                    if oldest and MessageEnvelope.parse_stream_id(oldest[0][0]) > last_id:
+                        truncated.append(name)  # Part of the gap was already trimmed away
+
+                    result = await self.redis.xread({stream_key: last_offset}, count=self.relay_config.stream_maxlen)
+                    for _, entries in result or []:
+                        for entry_id, fields in entries:
+                            message = fields.get("m")
+                            if message is None:
+                                continue
+                            message = MessageEnvelope.strip_origin(message)
+                            replayed.append((channel, MessageEnvelope.splice_fields(message, {"stream": name, "offset": entry_id})))
+                            replayed_upto[name] = MessageEnvelope.parse_stream_id(entry_id)
+        except Exception as e:
+            logger.error(f"Error replaying missed messages to client {client_id}: {e}", exc_info=True)
+        finally:
+            held = self._held_messages.pop(client_id, None) or []
+            outbox = self.client_outboxes.get(client_id)
+            if outbox:
+                for name in truncated:
+                    notice = {"action": "replayTruncated", "stream": name, "senderId": "server"}
+                    outbox.offer(self.serializer.pack(notice) if outbox.binary else self.serializer.dumps_bytes(notice))
+                for channel, message in replayed:
+                    outbox.offer(self._payload_for(outbox, message.encode('utf-8')))
+                for payload, conflation_key in held:
+                    stamp = MessageEnvelope.read_stream_offset(payload)
+                    if stamp and stamp[0] in replayed_upto and MessageEnvelope.parse_stream_id(stamp[1]) <= replayed_upto[stamp[0]]:
+                        continue  # Already delivered by the replay
+                    outbox.offer(self._payload_for(outbox, payload), conflation_key)
+
+        if replayed or truncated:
+            logger.info(f"Replayed {len(replayed)} missed message(s) to client {client_id}" + (f", truncated streams: {truncated}" if truncated else ""))
+        return len(replayed)
+
     # --- Internal PubSub Management ---
 
     def _is_channel_subscribed(self, channel: str) -> bool:
         """Checks if the server is currently subscribed to a Redis channel."""
-        return channel in self.pubsubs
+        return channel in self.subscribed_channels
 
     def _is_channel_in_use(self, channel: str) -> bool:
         """Checks if a channel has any active local subscribers (client or callback)."""
@@ -278,121 +736,256 @@ class MessageService:
         return has_clients or has_callbacks
 
     async def _subscribe_to_channel_if_needed(self, channel: str):
-        """Internal: Subscribes to Redis channel via adapter if not already done."""
-        if not self._is_channel_subscribed(channel):
+        """Internal: Adds the channel to the shared PubSub if not already done."""
+        async with self._pubsub_lock:
+            if self._is_channel_subscribed(channel):
+                return
             try:
-                pubsub = await self.redis.subscribe(channel)
-                if pubsub:
-                    self.pubsubs[channel] = pubsub
-                    self.listener_tasks[channel] = asyncio.create_task(
-                        self._listen_for_messages(channel, pubsub)
-                    )
-                    logger.info(f"Subscribed to Redis channel: {channel}")
-                else:
-                    logger.error(f"Failed to subscribe to Redis channel {channel} - adapter returned None")
+                if self._uses_sequence(channel):
+                    await self._start_sequencer(channel)
+                if self.pubsub is None:
+                    # Undecoded: message payloads go to the websockets as the bytes Redis sent
+                    self.pubsub = await self.redis.pubsub(decode_responses=False)
+                await self.pubsub.subscribe(channel)
+                self.subscribe_count += 1
+                self.subscribed_channels.add(channel)
+                self._channel_keys[channel.encode('utf-8')] = channel
+                logger.info(f"Subscribed to Redis channel: {channel} ({len(self.subscribed_channels)} channels on shared PubSub)")
             except Exception as e:
                 logger.error(f"Error subscribing to Redis channel {channel}: {e}", exc_info=True)
-                self.pubsubs.pop(channel, None) # Clean up if failed
+                self._stop_sequencer(channel)
+                return
+
+            # The reader only starts once the PubSub has a connection (after the first subscribe)
+            if self.listener_task is None or self.listener_task.done():
+                self.listener_task = asyncio.create_task(self._listen_for_messages(self.pubsub))
 
     async def _unsubscribe_from_channel_if_unused(self, channel: str):
-        """Internal: Unsubscribes from Redis channel if no local subscribers remain."""
-        if self._is_channel_subscribed(channel) and not self._is_channel_in_use(channel):
-            logger.info(f"Channel {channel} is no longer in use locally. Unsubscribing from Redis.")
-            pubsub = self.pubsubs.pop(channel, None)
-            task = self.listener_tasks.pop(channel, None)
-
-            if task and not task.done():
-                task.cancel()
+        """
+        Internal: Removes the channel from the shared PubSub if no local subscribers remain.
+        With a linger period the Redis unsubscribe is deferred, so a client that comes back
+        (e.g. a phone reconnecting) finds the channel still subscribed.
+        """
+        linger = self.relay_config.unsubscribe_linger
+        if linger > 0 and self._is_channel_subscribed(channel) and not self._is_channel_in_use(channel):
+            if channel not in self._lingering_channels:
+                self._lingering_channels[channel] = asyncio.get_running_loop().call_later(
+                    linger, self._on_linger_expired, channel)
+                logger.debug(f"Channel {channel} is no longer in use locally. Unsubscribing in {linger}s unless reused.")
+        else:
+            await self._unsubscribe_from_redis_if_unused(channel)
+
+        # Clean up potentially empty defaultdict entries
+        if not self.channel_to_clients.get(channel):
+            self.channel_to_clients.pop(channel, None)
+        if not self.server_callbacks.get(channel):
+            self.server_callbacks.pop(channel, None)
+
+    def _reuse_lingering_channel(self, channel: str):
+        """Internal: Keeps a lingering channel subscribed for a returning subscriber."""
+        handle = self._lingering_channels.pop(channel, None)
+        if handle is not None:
+            handle.cancel()
+            self.subscribes_avoided += 1
+            self.unsubscribes_avoided += 1
+            logger.debug(f"Reusing lingering subscription to {channel}")
+
+    def _on_linger_expired(self, channel: str):
+        """Internal: Nobody came back during the linger period; unsubscribe for real."""
+        self._lingering_channels.pop(channel, None)
+        self._expired_channels.add(channel)
+        self._ensure_cleanup_task()
+
+    async def _unsubscribe_from_redis_if_unused(self, channel: str):
+        """Internal: Sends the Redis UNSUBSCRIBE, unless a subscriber showed up in the meantime."""
+        async with self._pubsub_lock:
+            if self._is_channel_subscribed(channel) and not self._is_channel_in_use(channel):
+                logger.info(f"Channel {channel} is no longer in use locally. Unsubscribing from Redis.")
+                self.subscribed_channels.discard(channel)
+                self._channel_keys.pop(channel.encode('utf-8'), None)
+                self._stop_sequencer(channel)
+                if self.pubsub:
+                    try:
+                        await self.pubsub.unsubscribe(channel)
+                        self.unsubscribe_count += 1
+                    except Exception as e:
+                        logger.error(f"Error unsubscribing from Redis channel {channel}: {e}")
+
+    async def _listen_for_messages(self, pubsub):
+        """Internal: Reads every channel on the shared PubSub and routes messages by channel name."""
+        mode = self.relay_config.listener_mode
+        logger.info(f"Starting shared pub/sub listener ({mode} mode)")
+        try:
+            while True:
                 try:
-                    await task
+                    if mode == "poll":
+                        message = await self._poll_next_message(pubsub)
+                    else:
+                        message = await self._wait_for_next_message(pubsub)
                 except asyncio.CancelledError:
-                    pass # Expected
+                    raise
                 except Exception as e:
-                    logger.error(f"Error awaiting cancelled listener task for {channel}: {e}")
+                    # Keep the single reader alive; relaunching would risk duplicate readers
+                    logger.error(f"Error reading from shared PubSub: {e}", exc_info=True)
+                    await asyncio.sleep(5)
+                    continue
 
-            if pubsub: # aioredis pubsub doesn't always need explicit close, but adapter might
-                try:
-                    # Assuming RedisAdapter handles the actual unsubscribe call if needed when connections close
-                    # Or add an explicit unsubscribe method to RedisAdapter if required by the library
-                    # await self.redis.unsubscribe(channel) # If adapter has this method
-                    logger.debug(f"PubSub object removed for channel {channel}")
-                except Exception as e:
-                    logger.error(f"Error during pubsub cleanup for channel {channel}: {e}")
-            # Clean up potentially empty defaultdict entries
-            if not self.channel_to_clients.get(channel):
-                self.channel_to_clients.pop(channel, None)
-            if not self.server_callbacks.get(channel):
-                self.server_callbacks.pop(channel, None)
-
-    async def _listen_for_messages(self, channel: str, pubsub):
-        """Internal: Listens for messages on a Redis channel and dispatches them."""
-        try:
-            logger.info(f"Starting message listener for channel: {channel}")
-            while True:
-                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
                 if message:
-                    message_data = message.get('data')
-                    if message_data:
-                        # Decode if bytes (common with aioredis)
-                        if isinstance(message_data, bytes):
-                            message_data = message_data.decode('utf-8')
-                        await self._dispatch_message(channel, message_data)
-                await asyncio.sleep(0.01) # Small sleep to prevent tight loop if timeout occurs
+                    await self._route_pubsub_message(message)
         except asyncio.CancelledError:
-            logger.info(f"Listener task for channel {channel} cancelled.")
-        except Exception as e:
-            # Log errors but keep listening unless it's a critical Redis error
-            logger.error(f"Error in message listener for channel {channel}: {e}", exc_info=True)
-            # TODO: Add logic to potentially stop listening if Redis connection is lost
-            # Relaunch listener after a delay? Or rely on RedisAdapter health checks?
-            await asyncio.sleep(5) # Wait before potentially retrying loop
-            if channel in self.pubsubs: # Check if we are still supposed to be subscribed
-                asyncio.create_task(self._listen_for_messages(channel, pubsub)) # Relaunch task
+            logger.info("Shared pub/sub listener cancelled.")
         finally:
-            logger.info(f"Stopping message listener for channel: {channel}")
-            # Ensure cleanup happens even if loop exits unexpectedly
-            self.pubsubs.pop(channel, None)
-            self.listener_tasks.pop(channel, None)
-
-    async def _dispatch_message(self, channel: str, message_data: str):
-        """Internal: Dispatches a received message to server callbacks and subscribed clients."""
-        # 1. Dispatch to Server Callbacks
-        callbacks_to_run = self.server_callbacks.get(channel, [])
+            logger.info("Stopping shared pub/sub listener")
+
+    async def _poll_next_message(self, pubsub):
+        """
+        Internal: Legacy poll loop step - waits up to 1s for a message, then always sleeps 10ms.
+        Adds up to 10ms of latency per message; kept for comparison via PUBSUB_LISTENER_MODE=poll.
+        """
+        message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+        await asyncio.sleep(0.01) # Small sleep to prevent tight loop if timeout occurs
+        return message
+
+    async def _wait_for_next_message(self, pubsub):
+        """
+        Internal: Push-driven step - blocks on the PubSub socket until data arrives.
+
+        Buffered messages are returned straight from the parser without suspending, so a burst
+        is drained back-to-back before the loop yields to the event loop. The idle timeout only
+        bounds how long a quiet connection blocks; nothing sleeps between messages.
+        """
+        # timeout=None would fall back to the connection's socket_timeout and disconnect
+        # on an idle channel, so an explicit (long) idle timeout is used instead.
+        return await pubsub.get_message(
+            ignore_subscribe_messages=True,
+            timeout=self.relay_config.listener_idle_timeout
+        )
+
+    async def _route_pubsub_message(self, message: dict):
+        """Internal: Routes one message from the shared PubSub to its channel's local subscribers."""
+        raw_channel = message.get('channel')
+        message_data = message.get('data')
+        if not raw_channel or not message_data:
+            return
+        # The payload stays bytes all the way to the websocket frame; only the channel is mapped
+        channel = self._channel_keys.get(raw_channel)
+        if channel is None:
+            return # Message raced with an unsubscribe
+        if isinstance(message_data, str):
+            message_data = message_data.encode('utf-8')
+        if self.relay_config.local_delivery and MessageEnvelope.read_origin(message_data) == self.server_id:
+            return # Published by this server and already delivered locally
+
+        try:
+            self._deliver_in_order(channel, message_data)
+        except Exception as e:
+            logger.error(f"Error dispatching message on channel {channel}: {e}", exc_info=True)
+
+    def _dispatch_message(self, channel: str, payload: bytes):
+        """
+        Internal: Dispatches a received message to subscribed clients and server callbacks.
+        Nothing here awaits: client payloads are queued on their outboxes and callbacks on the
+        callback worker pool, so per-client order is the order of dispatch calls.
+
+        Args:
+            channel: Channel the message arrived on
+            payload: Encoded message, exactly as it goes out in the websocket frame
+        """
+        self._fan_out_to_clients(channel, payload)
+
+        # Server callbacks take str; decoded only when there are any
+        callbacks_to_run = self.server_callbacks.get(channel)
         if callbacks_to_run:
-            # logger.debug(f"Dispatching message on {channel} to {len(callbacks_to_run)} server callbacks.")
-            tasks = [callback(channel, message_data) for callback in callbacks_to_run]
-            await asyncio.gather(*tasks, return_exceptions=True)
+            self.callback_dispatcher.submit(channel, callbacks_to_run, payload.decode('utf-8'))
 
-        # 2. Dispatch to Subscribed Client WebSockets
-        client_ids_to_notify = list(self.channel_to_clients.get(channel, set())) # Iterate copy
+    def _fan_out_to_clients(self, channel: str, payload: bytes):
+        """Internal: Queues a message on the outbox of every client subscribed to the channel (no await)."""
+        client_ids_to_notify = self.channel_to_clients.get(channel)
         if client_ids_to_notify:
-            # logger.debug(f"Dispatching message on {channel} to {len(client_ids_to_notify)} clients: {client_ids_to_notify}")
-            client_tasks = []
+            # The origin stamp is only for servers (echo suppression, sequencing)
+            payload = MessageEnvelope.strip_origin(payload)
+            # logger.debug(f"Dispatching message on {channel} to {len(client_ids_to_notify)} clients")
+            # Every outbox gets the same bytes object per wire format; the MessagePack copy is
+            # transcoded at most once, and only if a binary client is subscribed
+            conflation_key = self._conflation_key(channel, payload)
+            msgpack_payload = None
             for client_id in client_ids_to_notify:
-                websocket = self.client_websockets.get(client_id)
-                if websocket and websocket.state == State.OPEN:
-                    client_tasks.append(self._send_to_websocket(websocket, message_data, client_id, channel))
-                elif websocket:
-                    logger.warning(f"Websocket for client {client_id} on channel {channel} is closed. Scheduling cleanup.")
-                    # Schedule cleanup for this specific client if websocket closed unexpectedly
-                    asyncio.create_task(self.unsubscribe_client_from_all(client_id))
+                outbox = self.client_outboxes.get(client_id)
+                if outbox is None or outbox.websocket.state != State.OPEN:
+                    # Closed or missing websocket: clean up their subscription state in the next batch
+                    self._schedule_client_cleanup(client_id)
+                    continue
+                held = self._held_messages.get(client_id)
+                if held is not None:
+                    # Client is mid-replay; keep live messages until the missed ones are queued
+                    held.append((payload, conflation_key))
+                    continue
+                if outbox.binary:
+                    if msgpack_payload is None:
+                        msgpack_payload = self._to_msgpack(payload)
+                    client_payload = msgpack_payload
                 else:
-                    logger.warning(f"Websocket not found for client {client_id} subscribed to {channel}. Removing subscription.")
-                    # Client websocket missing, clean up their subscription state
-                    asyncio.create_task(self.unsubscribe_client_from_all(client_id))
+                    client_payload = payload
+                # Non-blocking append; the client's writer task does the actual send. A client over
+                # its limits is evicted here and removed when its connection handler exits.
+                batched_channels = self._batched_channels.get(client_id)
+                outbox.offer(client_payload, conflation_key, batchable=bool(batched_channels) and channel in batched_channels)
+
+    def _payload_for(self, outbox: ClientOutbox, payload: bytes) -> bytes:
+        """Internal: Returns a JSON payload in the outbox's wire format (single-recipient paths)."""
+        return self._to_msgpack(payload) if outbox.binary else payload
+
+    def _to_msgpack(self, payload: bytes) -> bytes:
+        """Internal: Transcodes a JSON payload to MessagePack; non-JSON payloads are sent as a string."""
+        try:
+            return self.serializer.json_to_msgpack(payload)
+        except ValueError:
+            return self.serializer.pack(payload.decode('utf-8', errors='replace'))
 
-            if client_tasks:
-                await asyncio.gather(*client_tasks, return_exceptions=True)
+    def _conflation_key(self, channel: str, payload: bytes):
+        """
+        Internal: Returns the latest-wins key for a message, or None if it must always be delivered.
 
-    async def _send_to_websocket(self, websocket: WebSocketServerProtocol, message: str, client_id: str, channel: str):
-        """Internal helper to send message and handle exceptions."""
+        Only messages whose top-level `action` is a configured conflatable action get a key.
+        The substring pre-check keeps the JSON parse off the path for every other message.
+        """
+        if not self._conflation_markers or not any(marker in payload for marker in self._conflation_markers):
+            return None
         try:
-            await websocket.send(message)
-        except ConnectionClosed:
-            logger.warning(f"Connection closed while sending message to client {client_id} on channel {channel}. Scheduling cleanup.")
-            # Schedule cleanup for this specific client
-            asyncio.create_task(self.unsubscribe_client_from_all(client_id))
-        except Exception as e:
-            logger.error(f"Error sending message to client {client_id} on channel {channel}: {e}")
-            # Optionally trigger cleanup here too?
-            asyncio.create_task(self.unsubscribe_client_from_all(client_id))
+            action = self.serializer.loads(payload).get("action")
+        except (ValueError, AttributeError):
+            return None
+        if action in self.relay_config.conflate_actions:
+            return (channel, action)
+        return None
+
+    def _schedule_client_cleanup(self, client_id: str):
+        """Internal: Queues a client for batched subscription cleanup."""
+        self._pending_cleanup.add(client_id)
+        self._ensure_cleanup_task()
+
+    def _ensure_cleanup_task(self):
+        if self._cleanup_task is None or self._cleanup_task.done():
+            self._cleanup_task = asyncio.create_task(self._run_client_cleanup())
+
+    async def _run_client_cleanup(self):
+        """Internal: Drains queued client cleanups and expired channel lingers in batches."""
+        await asyncio.sleep(0) # Let the current fan-out finish collecting closed sockets
+        while self._pending_cleanup or self._expired_channels:
+            client_ids = self._pending_cleanup
+            self._pending_cleanup = set()
+            if client_ids:
+                logger.warning(f"Cleaning up {len(client_ids)} client(s) with closed or missing websockets: {list(client_ids)}")
+            for client_id in client_ids:
+                try:
+                    await self.unsubscribe_client_from_all(client_id)
+                except Exception as e:
+                    logger.error(f"Error cleaning up client {client_id}: {e}")
+
+            channels = self._expired_channels
+            self._expired_channels = set()
+            for channel in channels:
+                try:
+                    await self._unsubscribe_from_redis_if_unused(channel)
+                except Exception as e:
+                    logger.error(f"Error unsubscribing expired channel {channel}: {e}")
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import time
+import zlib
+
+logger = logging.getLogger(__name__)
+
+class CallbackStats:
+    """Calls, errors and run time of one server callback."""
+    __slots__ = ("calls", "errors", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float, failed: bool):
+        self.calls += 1
+        if failed:
+            self.errors += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def snapshot(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avgMs": round(self.total_time / self.calls * 1000, 3) if self.calls else 0.0,
+            "maxMs": round(self.max_time * 1000, 3),
+        }
+
+class CallbackDispatcher:
+    """
+    Bounded worker pool that runs server-side channel callbacks off the pub/sub listener.
+
+    Each channel is pinned to one worker (by a stable hash of its name), so a channel's
+    messages reach its callbacks in the order they were received, while different channels
+    run concurrently. Submitting never awaits: the listener hands the message over and goes
+    straight back to websocket fan-out. Each worker queue is bounded; when a worker cannot
+    keep up its queue fills and further messages for its channels are dropped (and counted)
+    instead of growing memory without limit.
+
+    Callbacks run one at a time per worker; an exception in one is logged and does not affect
+    the other callbacks of the same message. Calls, errors and latency are also kept per callback.
+    """
+
+    def __init__(self, workers: int, max_queue: int):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._queues = []
+        self._tasks = []
+
+        # Stats
+        self.processed = 0
+        self.errors = 0
+        self.dropped = 0
+        self.peak_depth = 0
+        # Callback name -> CallbackStats
+        self.callback_stats = {}
+
+    def submit(self, channel: str, callbacks: list, message: str) -> bool:
+        """
+        Queue a message for the channel's callbacks without awaiting.
+
+        Returns:
+            True if queued, False if the channel's worker queue is full (message dropped)
+        """
+        if not self._tasks:
+            self._start()
+        queue = self._queues[zlib.crc32(channel.encode('utf-8')) % self.workers]
+        try:
+            queue.put_nowait((channel, tuple(callbacks), message))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"Callback queue full ({self.max_queue}), dropped message on {channel}")
+            return False
+        self.peak_depth = max(self.peak_depth, queue.qsize())
+        return True
+
+    async def stop(self):
+        """Cancel the workers; queued messages are discarded."""
+        tasks, self._tasks, self._queues = self._tasks, [], []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        """Current metrics (served on /metrics)."""
+        depths = [queue.qsize() for queue in self._queues]
+        return {
+            "workers": self.workers,
+            "queued": sum(depths),
+            "maxDepth": max(depths, default=0),
+            "peakDepth": self.peak_depth,
+            "processed": self.processed,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "byCallback": {name: stats.snapshot() for name, stats in self.callback_stats.items()},
+        }
+
+    def _start(self):
+        """Internal: Creates the worker queues and tasks (lazily, inside the running loop)."""
+        self._queues = [asyncio.Queue(maxsize=self.max_queue) for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._run(queue)) for queue in self._queues]
+
+    async def _run(self, queue: asyncio.Queue):
+        """Internal: Worker loop, runs each queued message's callbacks in order."""
+        while True:
+            channel, callbacks, message = await queue.get()
+            for callback in callbacks:
+                name = getattr(callback, '__qualname__', None) or repr(callback)
+                stats = self.callback_stats.get(name)
+                if stats is None:
+                    stats = self.callback_stats[name] = CallbackStats()
+                started = time.perf_counter()
+                failed = False
+                try:
+                    await callback(channel, message)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failed = True
+                    self.errors += 1
+                    logger.error(f"Server callback {name} failed on {channel}: {e}", exc_info=True)
+                stats.record(time.perf_counter() - started, failed)
+            self.processed += 1
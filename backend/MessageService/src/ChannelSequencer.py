@@ -0,0 +1,77 @@
+class SequenceStats:
+    """Lifetime ordering counters shared by every ChannelSequencer of one MessageService."""
+
+    def __init__(self):
+        self.reordered = 0      # messages that arrived early and were held back
+        self.duplicates = 0     # messages dropped because their sequence number was already delivered
+        self.gaps = 0           # sequence numbers skipped after waiting for them timed out
+        self.resets = 0         # channel counters that restarted (e.g. the Redis key expired)
+
+    def snapshot(self) -> dict:
+        return {
+            "reordered": self.reordered,
+            "duplicates": self.duplicates,
+            "gaps": self.gaps,
+            "resets": self.resets,
+        }
+
+class ChannelSequencer:
+    """
+    Reorder buffer for one channel's sequence-numbered messages.
+
+    Messages are released strictly in sequence order. An early message is held until the
+    missing ones arrive; if they never do, skip_gap() releases what is held (the caller runs it
+    after a timeout) and the client sees the jump in "seq". Anything at or below the last
+    released number is a duplicate and dropped.
+    """
+
+    def __init__(self, next_seq: int, max_pending: int, stats: SequenceStats):
+        self.next_seq = next_seq
+        self.max_pending = max_pending
+        self.stats = stats
+        # Sequence number -> payload, for messages that arrived ahead of next_seq
+        self.pending = {}
+        # asyncio TimerHandle that calls skip_gap() (owned by MessageService)
+        self.gap_timer = None
+
+    def accept(self, seq: int, payload) -> list:
+        """
+        Take one message and return the payloads that can now be delivered, in order.
+        """
+        if seq < self.next_seq:
+            if self.next_seq - seq <= self.max_pending:
+                self.stats.duplicates += 1
+                return []
+            # Far behind: the channel's counter restarted, follow it
+            self.stats.resets += 1
+            self.next_seq = seq
+            self.pending.clear()
+
+        if seq > self.next_seq:
+            if seq in self.pending:
+                self.stats.duplicates += 1
+                return []
+            self.pending[seq] = payload
+            self.stats.reordered += 1
+            if len(self.pending) > self.max_pending:
+                return self.skip_gap()
+            return []
+
+        self.next_seq = seq + 1
+        return [payload] + self._drain()
+
+    def skip_gap(self) -> list:
+        """Give up on the missing sequence numbers and release held messages up to the next gap."""
+        if not self.pending:
+            return []
+        lowest = min(self.pending)
+        self.stats.gaps += lowest - self.next_seq
+        self.next_seq = lowest
+        return self._drain()
+
+    def _drain(self) -> list:
+        ready = []
+        while self.next_seq in self.pending:
+            ready.append(self.pending.pop(self.next_seq))
+            self.next_seq += 1
+        return ready
@@ -0,0 +1,250 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from websockets.exceptions import ConnectionClosed
+
+logger = logging.getLogger(__name__)
+
+# Close code sent to clients that cannot keep up with their game's message rate
+# (4000-4999 is the range reserved for application-defined close codes)
+SLOW_CONSUMER_CLOSE_CODE = 4008
+SLOW_CONSUMER_CLOSE_REASON = "Slow consumer"
+
+class _QueuedMessage:
+    """One queued payload; `live` is cleared when a newer message with the same key supersedes it."""
+    __slots__ = ("payload", "enqueued_at", "conflation_key", "batchable", "live")
+
+    def __init__(self, payload: bytes, enqueued_at: float, conflation_key, batchable: bool):
+        self.payload = payload
+        self.enqueued_at = enqueued_at
+        self.conflation_key = conflation_key
+        self.batchable = batchable
+        self.live = True
+
+class ClientOutbox:
+    """
+    Bounded outbound queue with a dedicated writer task for one client websocket.
+
+    Fan-out only appends pre-encoded payloads here (no await), so one slow phone can never
+    stall delivery to the rest of the room. The writer task drains the queue in order and
+    waits on the socket's own backpressure. When the client falls too far behind - too many
+    queued messages, too many queued bytes, or the oldest message waiting too long - it is
+    evicted: the queue is dropped and the socket is closed with SLOW_CONSUMER_CLOSE_CODE.
+
+    Messages offered with a conflation key are latest-wins: if an older message with the same
+    key is still queued it is dropped, so a lagging client skips stale timer ticks/state
+    snapshots and jumps straight to the current one.
+
+    Payloads are sent as text frames (JSON), or as binary frames for clients on the
+    MessagePack subprotocol.
+
+    With batching enabled, consecutive messages offered as batchable are held for up to
+    batch_window seconds (or batch_max messages) and sent as one array frame built by
+    batch_joiner. A non-batchable message flushes the pending batch first, so delivery order
+    is unchanged; a batch of one is sent as the plain message.
+    """
+
+    def __init__(self, client_id: str, websocket, max_depth: int, max_bytes: int, max_lag: float, binary: bool = False):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.binary = binary
+
+        # Batching (off until enable_batching() is called)
+        self.batch_window = 0.0
+        self.batch_max = 1
+        self.batch_joiner = None
+        self.batched_frames = 0
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.max_lag = max_lag
+
+        # _QueuedMessage entries in delivery order (superseded entries stay in place, not live)
+        self.queue = deque()
+        # Conflation key -> its most recent live entry in the queue
+        self.latest_by_key = {}
+        self.depth = 0
+        self.queued_bytes = 0
+        self.evicted = False
+        self.closed = False
+
+        # Stats
+        self.sent_count = 0
+        self.conflated_count = 0
+        self.peak_depth = 0
+
+        self._wakeup = asyncio.Event()
+        self.writer_task = asyncio.create_task(self._run())
+
+    def enable_batching(self, window: float, max_messages: int, joiner):
+        """
+        Coalesce batchable messages into array frames.
+
+        Args:
+            window: Seconds the first message of a batch may wait for more
+            max_messages: Batch size at which the frame is sent without waiting further
+            joiner: Callable turning a list of payloads into one array payload
+        """
+        self.batch_window = window
+        self.batch_max = max(1, max_messages)
+        self.batch_joiner = joiner
+
+    def offer(self, payload: bytes, conflation_key=None, batchable: bool = False) -> bool:
+        """
+        Queue a payload for this client without awaiting.
+
+        Args:
+            payload: Encoded message
+            conflation_key: Optional key; a still-queued older message with the same key is dropped
+            batchable: May be coalesced with neighbouring batchable messages (if batching is enabled)
+
+        Returns:
+            True if queued, False if the outbox is closed or the client was just evicted
+        """
+        if self.closed or self.evicted:
+            return False
+
+        superseded = self.latest_by_key.get(conflation_key) if conflation_key is not None else None
+        if superseded is not None:
+            self._drop(superseded)
+            self.conflated_count += 1
+
+        if self.depth >= self.max_depth:
+            self._evict(f"queue depth {self.depth} >= {self.max_depth}")
+            return False
+        if self.queued_bytes + len(payload) > self.max_bytes:
+            self._evict(f"queued bytes {self.queued_bytes + len(payload)} > {self.max_bytes}")
+            return False
+        now = time.monotonic()
+        if self.queue and now - self.queue[0].enqueued_at > self.max_lag:
+            self._evict(f"lag {now - self.queue[0].enqueued_at:.2f}s > {self.max_lag}s")
+            return False
+
+        entry = _QueuedMessage(payload, now, conflation_key, batchable and self.batch_joiner is not None)
+        self.queue.append(entry)
+        if conflation_key is not None:
+            self.latest_by_key[conflation_key] = entry
+        self.depth += 1
+        self.queued_bytes += len(payload)
+        if self.depth > self.peak_depth:
+            self.peak_depth = self.depth
+        self._wakeup.set()
+        return True
+
+    def close(self):
+        """Stop the writer and drop anything still queued (client unsubscribed or disconnected)."""
+        if self.closed:
+            return
+        self.closed = True
+        self._clear()
+        if not self.evicted and not self.writer_task.done():
+            self.writer_task.cancel()
+
+    def stats(self) -> dict:
+        """Current queue metrics for this client."""
+        return {
+            "depth": self.depth,
+            "bytes": self.queued_bytes,
+            "peakDepth": self.peak_depth,
+            "sent": self.sent_count,
+            "conflated": self.conflated_count,
+            "batchedFrames": self.batched_frames,
+            "evicted": self.evicted,
+        }
+
+    def _evict(self, reason: str):
+        """Drop the queue and hand the socket to the writer for closing with the slow-consumer code."""
+        logger.warning(f"Evicting slow client {self.client_id}: {reason}")
+        self.evicted = True
+        self._clear()
+        # The writer may be blocked in send() on a congested socket; cancelling it
+        # routes it straight to the close at the end of _run().
+        if not self.writer_task.done():
+            self.writer_task.cancel()
+
+    def _drop(self, entry: _QueuedMessage):
+        """Mark a queued entry as superseded and trim superseded entries off the head."""
+        entry.live = False
+        self.depth -= 1
+        self.queued_bytes -= len(entry.payload)
+        if self.latest_by_key.get(entry.conflation_key) is entry:
+            del self.latest_by_key[entry.conflation_key]
+        while self.queue and not self.queue[0].live:
+            self.queue.popleft()
+
+    def _take(self, entry: _QueuedMessage):
+        """Account for a live entry leaving the queue for the socket."""
+        self.depth -= 1
+        self.queued_bytes -= len(entry.payload)
+        if entry.conflation_key is not None and self.latest_by_key.get(entry.conflation_key) is entry:
+            del self.latest_by_key[entry.conflation_key]
+
+    async def _collect_batch(self, first: _QueuedMessage) -> list:
+        """
+        Gather the batchable messages queued right behind `first`, waiting until the batch
+        window (measured from when `first` was queued) closes or the batch is full.
+        """
+        batch = [first.payload]
+        deadline = first.enqueued_at + self.batch_window
+        while len(batch) < self.batch_max:
+            if not self.queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                continue
+            entry = self.queue[0]
+            if not entry.live:
+                self.queue.popleft()
+                continue
+            if not entry.batchable:
+                break # Keep order: flush what we have before the next unbatched message
+            self.queue.popleft()
+            self._take(entry)
+            batch.append(entry.payload)
+        return batch
+
+    def _clear(self):
+        self.queue.clear()
+        self.latest_by_key.clear()
+        self.depth = 0
+        self.queued_bytes = 0
+
+    async def _run(self):
+        """Writer task: sends queued payloads in order, one at a time."""
+        try:
+            while True:
+                while not self.queue:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                entry = self.queue.popleft()
+                if not entry.live:
+                    continue
+                self._take(entry)
+                if entry.batchable:
+                    batch = await self._collect_batch(entry)
+                    if len(batch) > 1:
+                        await self.websocket.send(self.batch_joiner(batch), text=not self.binary)
+                        self.sent_count += len(batch)
+                        self.batched_frames += 1
+                        continue
+                await self.websocket.send(entry.payload, text=not self.binary)
+                self.sent_count += 1
+        except asyncio.CancelledError:
+            pass
+        except ConnectionClosed:
+            logger.debug(f"Connection closed while writing to client {self.client_id}")
+            return
+        except Exception as e:
+            logger.error(f"Error writing to client {self.client_id}: {e}")
+            return
+
+        if self.evicted:
+            try:
+                await self.websocket.close(SLOW_CONSUMER_CLOSE_CODE, SLOW_CONSUMER_CLOSE_REASON)
+            except Exception as e:
+                logger.debug(f"Error closing evicted client {self.client_id}: {e}")
@@ -0,0 +1,134 @@
+import json
+import re
+
+# Trailer spliced onto every message published through a Redis Stream
+_STREAM_TRAILER = r'"stream":"([^"\\]*)","offset":"(\d+-\d+)"\}\s*$'
+# Origin stamp, optionally followed by the sequence number (and name of its counter) and stream trailer (Redis appends after it)
+_ORIGIN_TRAILER = r'"origin":"([^"\\]*)"(?:,"seq":\d+(?:,"seqChannel":"[^"\\]*")?)?(?:,"stream":"[^"\\]*","offset":"\d+-\d+")?\}\s*$'
+# Sequence number, only trusted directly after the origin stamp (a client cannot forge it)
+_SEQUENCE_TRAILER = r'"origin":"[^"\\]*","seq":(\d+)(?:,"seqChannel":"[^"\\]*")?(?:,"stream":"[^"\\]*","offset":"\d+-\d+")?\}\s*$'
+
+# Compiled for both str and bytes messages (payloads from Redis stay bytes end to end)
+_PATTERNS = {
+    str: {"stream": re.compile(_STREAM_TRAILER), "origin": re.compile(_ORIGIN_TRAILER),
+          "seq": re.compile(_SEQUENCE_TRAILER)},
+    bytes: {"stream": re.compile(_STREAM_TRAILER.encode()), "origin": re.compile(_ORIGIN_TRAILER.encode()),
+            "seq": re.compile(_SEQUENCE_TRAILER.encode())},
+}
+
+def _as_str(value):
+    return value.decode('utf-8') if isinstance(value, bytes) else value
+
+class MessageEnvelope:
+    """
+    Helpers for adding server-side fields to already-encoded JSON messages without a full
+    decode/encode round trip.
+
+    Fields are appended at the END of the top-level object. JSON.parse (and Python's json)
+    keep the last occurrence of a duplicate key, so a client cannot spoof a server-stamped
+    field by sending it itself.
+    """
+
+    @staticmethod
+    def splice_fields(message: str, fields: dict) -> str:
+        """
+        Append fields to an encoded JSON object.
+
+        Args:
+            message: Encoded JSON object, e.g. '{"action":"x"}'
+            fields: Fields to add, e.g. {"offset": "1-0"}
+
+        Returns:
+            The message with the fields appended, or the message unchanged if it is not an object
+        """
+        return MessageEnvelope.splice_encoded(message, MessageEnvelope.encode_fields(fields))
+
+    @staticmethod
+    def encode_fields(fields: dict) -> str:
+        """Encode fields once for splice_encoded(), e.g. {"senderId": "c1"} -> '"senderId":"c1"'."""
+        return ",".join(f"{json.dumps(key)}:{json.dumps(value)}" for key, value in fields.items())
+
+    @staticmethod
+    def splice_encoded(message: str, encoded: str) -> str:
+        """
+        Append pre-encoded fields (from encode_fields) to an encoded JSON object. Only the first
+        and last character are checked; the object itself is not parsed.
+
+        Returns:
+            The message with the fields appended, or the message unchanged if it is not an object
+        """
+        body = message.rstrip()
+        if body[:1] != "{" or body[-1:] != "}":
+            return message
+        if body[1:-1].strip():
+            return body[:-1] + "," + encoded + "}"
+        return "{" + encoded + "}"
+
+    @staticmethod
+    def join_array(payloads: list) -> bytes:
+        """Join encoded JSON messages (bytes) into one JSON array without re-encoding them."""
+        return b"[" + b",".join(payloads) + b"]"
+
+    @staticmethod
+    def read_stream_offset(message):
+        """
+        Read the stream name and offset stamped onto a stream-backed message (str or bytes).
+
+        Returns:
+            (stream, offset) tuple of str, or None if the message carries no offset trailer
+        """
+        match = _PATTERNS[type(message)]["stream"].search(message, max(0, len(message) - 128))
+        if not match:
+            return None
+        return _as_str(match.group(1)), _as_str(match.group(2))
+
+    @staticmethod
+    def read_origin(message):
+        """
+        Read the origin server ID stamped onto a message (str or bytes) by the publishing MessageService.
+        Only the trailer is inspected, so an "origin" key inside the client's own payload is ignored.
+
+        Returns:
+            The origin server ID, or None if the message is not stamped
+        """
+        match = _PATTERNS[type(message)]["origin"].search(message, max(0, len(message) - 256))
+        return _as_str(match.group(1)) if match else None
+
+    @staticmethod
+    def strip_origin(message):
+        """
+        Remove the origin stamp from a message (str or bytes) before it goes out to clients, so
+        internal server IDs are not exposed. Fields stamped after it (seq, seqChannel, stream, offset) are kept.
+
+        Returns:
+            The message without the stamp, or the message unchanged if it is not stamped
+        """
+        match = _PATTERNS[type(message)]["origin"].search(message, max(0, len(message) - 256))
+        if not match:
+            return message
+        start, end = match.start(), match.end(1) + 1  # '"origin":"<id>"'
+        if message[start - 1:start] in (",", b","):
+            start -= 1
+        elif message[end:end + 1] in (",", b","):
+            end += 1  # The stamp was the object's first field
+        return message[:start] + message[end:]
+
+    @staticmethod
+    def read_sequence(message):
+        """
+        Read the per-channel sequence number Redis stamped onto a message (str or bytes).
+
+        Returns:
+            The sequence number as int, or None if the message is not sequenced
+        """
+        match = _PATTERNS[type(message)]["seq"].search(message, max(0, len(message) - 256))
+        return int(match.group(1)) if match else None
+
+    @staticmethod
+    def parse_stream_id(offset: str):
+        """Turn a Redis Stream ID ("<ms>-<seq>") into a comparable tuple, or None if malformed."""
+        try:
+            ms, seq = offset.split("-", 1)
+            return int(ms), int(seq)
+        except (AttributeError, ValueError):
+            return None
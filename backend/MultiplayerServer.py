@@ -8,14 +8,27 @@ import json
 import time
 import sys
 import secrets
+import socket
+from http import HTTPStatus
 from dotenv import load_dotenv
 
+try:
+    import uvloop
+except ImportError:  # optional speedup; the default asyncio loop is used when it is not installed
+    uvloop = None
+
 # Add the current directory to Python path so backend imports work
 
 from ConnectionService.ConnectionService import ConnectionService
 from commons.adapters.RedisAdapter import RedisAdapter
 from MessageService.MessageService import MessageService
 from configuration.RedisConfig import RedisConfig
+from configuration.RelayConfig import RelayConfig
+from configuration.WebSocketConfig import WebSocketConfig
+from configuration.AdmissionConfig import AdmissionConfig
+from ConnectionService.src.AdmissionController import AdmissionController
+from ConnectionService.src.CompressionExtension import ThresholdPerMessageDeflateFactory, compression_stats
+from ConnectionService.src.GameStateStore import GameStateStore
 from configuration.AppConfig import AppConfig
 from commons.enums.Stage import Stage
 from AuthService.AuthService import AuthService
@@ -36,9 +49,17 @@ message_service = None
 redis_adapter = None
 auth_service = None
 rate_limit_service = None
+admission_controller = None
+# Index of this process in --workers mode (None when running as a single process)
+worker_id = None
+shutting_down = False
 
 async def shutdown(signal, loop):
     """Cleanup tasks tied to the service's shutdown."""
+    global shutting_down
+    if shutting_down:
+        return # e.g. Ctrl+C reaches a worker directly and again via the supervisor
+    shutting_down = True
     logger.info(f"Received exit signal {signal.name}...")
 
     if connection_service:
@@ -48,6 +69,9 @@ async def shutdown(signal, loop):
     if message_service:
         await message_service.stop()
 
+    if admission_controller:
+        await admission_controller.stop()
+
     if redis_adapter:
         logger.info("Closing Redis connections...")
         await redis_adapter.close()
@@ -82,14 +106,115 @@ async def shutdown(signal, loop):
     logger.info("Shutdown complete.")
     loop.stop()
 
-async def main(args):
-    global connection_service, message_service, redis_adapter, auth_service, rate_limit_service
+def json_response(connection, status: HTTPStatus, body: dict):
+    """Plain HTTP JSON response sent instead of the websocket handshake."""
+    response = connection.respond(status, json.dumps(body) + "\n")
+    del response.headers["Content-Type"]
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+def process_http_request(connection, request):
+    """
+    Serve plain HTTP endpoints on the WebSocket port before the upgrade handshake.
+    Returning None lets the WebSocket handshake continue as usual.
+
+    GET /metrics -> JSON relay metrics (channels, clients, outbound queue depth, compression)
+    GET /load    -> JSON load of this process for balancers (503 while it is not accepting)
+
+    Any other request is a websocket handshake and goes through admission control: beyond
+    the connection caps it is refused with 503, Retry-After and a redirect hint.
+    """
+    path = request.path.split("?", 1)[0]
+    if path == "/metrics" and message_service:
+        metrics = {**message_service.get_metrics(), "compression": compression_stats.snapshot()}
+        if admission_controller:
+            metrics["admission"] = admission_controller.stats()
+        if connection_service and connection_service.rateLimiter:
+            metrics["rateLimits"] = connection_service.rateLimiter.stats()
+        if redis_adapter:
+            serializer = redis_adapter.serializer
+            metrics["serializer"] = {"legacyJsonFallback": serializer.legacy_json_fallback, "legacyFallbackHits": serializer.legacy_fallback_hits}
+        if worker_id is not None:
+            # Each worker reports only its own connections; the kernel picks the worker per request
+            metrics["worker"] = {"id": worker_id, "pid": os.getpid()}
+        return json_response(connection, HTTPStatus.OK, metrics)
+    if path == "/load" and admission_controller:
+        status = HTTPStatus.OK if admission_controller.is_accepting() else HTTPStatus.SERVICE_UNAVAILABLE
+        return json_response(connection, status, admission_controller.load())
+    if admission_controller:
+        reason = admission_controller.check_admission()
+        if reason:
+            retry_after = admission_controller.config.retry_after
+            redirect = admission_controller.redirect_target()
+            logger.warning(f"Rejecting connection: {reason} cap reached (redirect: {redirect})")
+            body = {"error": "Server at capacity", "retryAfter": retry_after, "redirect": redirect}
+            response = json_response(connection, HTTPStatus.SERVICE_UNAVAILABLE, body)
+            response.headers["Retry-After"] = str(retry_after)
+            if redirect:
+                response.headers["X-QueuePlay-Redirect"] = redirect
+            return response
+    return None
+
+def select_subprotocol(connection, subprotocols):
+    """
+    Pick the wire format during the handshake.
+    Clients that offer RelayConfig.MSGPACK_SUBPROTOCOL get MessagePack binary frames;
+    everyone else (including clients offering no subprotocol) stays on JSON text frames.
+    """
+    if RelayConfig.MSGPACK_SUBPROTOCOL in subprotocols:
+        return RelayConfig.MSGPACK_SUBPROTOCOL
+    return None
+
+def install_event_loop(event_loop: str) -> str:
+    """
+    Select the event loop implementation before any loop is created.
+
+    Args:
+        event_loop: "auto", "uvloop" or "asyncio" (WebSocketConfig.EVENT_LOOPS)
+
+    Returns:
+        The loop actually used ("uvloop" or "asyncio")
+    """
+    if event_loop in ("auto", "uvloop") and uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        return "uvloop"
+    if event_loop == "uvloop":
+        logger.warning("uvloop is not installed; using the default asyncio event loop")
+    return "asyncio"
+
+def build_websocket_config(args) -> WebSocketConfig:
+    """WebSocketConfig from the environment, with command-line options taking precedence."""
+    websocket_config = WebSocketConfig()
+    if args.event_loop:
+        websocket_config.event_loop = args.event_loop
+    if args.max_size is not None:
+        websocket_config.max_size = args.max_size or None
+    if args.max_queue is not None:
+        websocket_config.max_queue = args.max_queue or None
+    if args.write_limit is not None:
+        websocket_config.write_limit = args.write_limit
+    if args.ping_interval is not None:
+        websocket_config.ping_interval = args.ping_interval or None
+    if args.ping_timeout is not None:
+        websocket_config.ping_timeout = args.ping_timeout or None
+    if args.close_timeout is not None:
+        websocket_config.close_timeout = args.close_timeout or None
+    return websocket_config
+
+async def main(args, websocket_config: WebSocketConfig = None):
+    global connection_service, message_service, redis_adapter, auth_service, rate_limit_service, admission_controller
 
     # STEP 1) Get config from arguments, environment variables, or use defaults
     host = args.host if args.host else os.environ.get("WS_HOST", "0.0.0.0")  # Bind to all interfaces
     # Use Heroku's PORT environment variable first, then WS_PORT, then default
     port = args.port if args.port else int(os.environ.get("PORT", os.environ.get("WS_PORT", "6789")))
-    server_id = os.environ.get("SERVER_ID", f"server-{port}")
+    # The one ID of this process: key in the shared load registry, serverId in logs and the shutdown
+    # notice, and origin stamp that MessageService uses to skip its own Redis echoes. So it must
+    # differ between processes; the default is unique per process (nodes on the same default port
+    # would otherwise overwrite each other)
+    server_id = os.environ.get("SERVER_ID") or f"{socket.gethostname()}-{port}-{secrets.token_hex(4)}"
+    if worker_id is not None:
+        server_id = f"{server_id}-w{worker_id}"
     stage_str = os.environ.get("STAGE", "DEVO")
     stage = Stage[stage_str] if stage_str in Stage.__members__ else Stage.DEVO
 
@@ -132,12 +257,19 @@ async def main(args):
         return
 
     # STEP 3) Initialize message service first (for pub/sub)
-    message_service = MessageService(redis_adapter)
+    relay_config = RelayConfig()
+    message_service = MessageService(redis_adapter, relay_config, server_id)
     await message_service.start()
 
     # STEP 6: Initialize connection service with security
-    connection_service = ConnectionService()
+    connection_service = ConnectionService(relay_config, redis_adapter.serializer, server_id)
     connection_service.messageService = message_service # Connect to Message Service
+    if relay_config.state_sync_enabled:
+        connection_service.gameStateStore = GameStateStore(redis_adapter, relay_config)
+    admission_controller = AdmissionController(AdmissionConfig(), redis_adapter, server_id)
+    connection_service.admissionController = admission_controller
+    connection_service.authService = auth_service
+    admission_controller.start()
     
     # Ensure JWT secret is available to ConnectionService
     connection_service.jwt_secret = JWT_SECRET
@@ -155,7 +287,29 @@ async def main(args):
 
     # STEP 8) Start the WebSocket server
     try:
-        async with websockets.serve(connection_service.handleConnection, host, port):
+        websocket_config = websocket_config or build_websocket_config(args)
+        serve_options = {"process_request": process_http_request, **websocket_config.get_serve_options()}
+        if worker_id is not None:
+            # Every worker binds the same port; the kernel spreads new connections across them
+            serve_options["reuse_port"] = True
+        if relay_config.msgpack_enabled:
+            if redis_adapter.serializer.msgpack_available:
+                serve_options["subprotocols"] = [RelayConfig.MSGPACK_SUBPROTOCOL]
+                serve_options["select_subprotocol"] = select_subprotocol
+            else:
+                logger.warning("msgpack is not installed; MessagePack subprotocol disabled (JSON only)")
+
+        if websocket_config.compression_enabled:
+            # Replaces the library's default permessage-deflate (compression="deflate")
+            serve_options["compression"] = None
+            serve_options["extensions"] = [ThresholdPerMessageDeflateFactory(websocket_config)]
+            logger.info(f"permessage-deflate: frames >= {websocket_config.compression_min_size} bytes, "
+                        f"window bits {websocket_config.server_max_window_bits}/{websocket_config.client_max_window_bits}, "
+                        f"memLevel {websocket_config.memory_level}")
+        else:
+            serve_options["compression"] = None
+
+        async with websockets.serve(connection_service.handleConnection, host, port, **serve_options):
             logger.info(f"Secured WebSocket server {server_id} started on ws://{host}:{port}")
             logger.info(f"Security features: JWT authentication, rate limiting, WebSocket protection")
             logger.info(f"Server ready! Redis and all security services started successfully.")
@@ -174,6 +328,58 @@ async def main(args):
         logger.error(f"Unexpected error starting WebSocket server: {e}")
         raise
 
+def run_workers(args, websocket_config: WebSocketConfig = None):
+    """
+    Supervisor for --workers N: forks N worker processes and waits for them.
+
+    Each worker runs main() with its own event loop, ConnectionService, MessageService and
+    Redis connections, bound to the same port with SO_REUSEPORT. Players of one game may land
+    on different workers; Redis pub/sub relays between them exactly as between servers.
+    SIGTERM/SIGINT/SIGHUP are forwarded to every worker, which then runs shutdown().
+    """
+    global worker_id
+    children = {}
+    for i in range(args.workers):
+        pid = os.fork()
+        if pid == 0:
+            # Worker: drop the supervisor's handlers, main() installs its own
+            for s in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+                signal.signal(s, signal.SIG_DFL)
+            worker_id = i
+            exit_code = 0
+            try:
+                asyncio.run(main(args, websocket_config))
+            except KeyboardInterrupt:
+                pass
+            except Exception as e:
+                if not shutting_down: # shutdown() stops the loop under asyncio.run on purpose
+                    logger.error(f"Worker {i} error: {e}")
+                    exit_code = 1
+            finally:
+                logging.shutdown()
+                os._exit(exit_code)
+        children[pid] = i
+    logger.info(f"Started {args.workers} workers: {sorted(children)}")
+
+    def forward(signum, frame):
+        logger.info(f"Supervisor received {signal.Signals(signum).name}, forwarding to {len(children)} workers")
+        for pid in list(children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    for s in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+        signal.signal(s, forward)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        i = children.pop(pid, None)
+        logger.info(f"Worker {i} (pid {pid}) exited with status {os.waitstatus_to_exitcode(status)}")
+
 # command line interface
 def parse_args():
     """
@@ -184,6 +390,16 @@ def parse_args():
     parser = argparse.ArgumentParser(description='QueuePlay Secured Multiplayer Game Server')
     parser.add_argument('--host', type=str, help='Host to bind the WebSocket server (default from env or localhost)')
     parser.add_argument('--port', type=int, help='Port to bind the WebSocket server (default from env or 6789)')
+    parser.add_argument('--workers', type=int, default=int(os.environ.get("WS_WORKERS", "1")),
+                        help='Worker processes sharing the port via SO_REUSEPORT (default from WS_WORKERS or 1)')
+    # Websocket server tuning (default from WS_* env vars, see WebSocketConfig); 0 = no limit / disabled
+    parser.add_argument('--event-loop', choices=WebSocketConfig.EVENT_LOOPS, help='Event loop implementation (default from WS_EVENT_LOOP or auto)')
+    parser.add_argument('--max-size', type=int, help='Largest incoming message in bytes')
+    parser.add_argument('--max-queue', type=int, help='Incoming messages buffered per connection')
+    parser.add_argument('--write-limit', type=int, help='Outgoing buffer high-water mark in bytes')
+    parser.add_argument('--ping-interval', type=float, help='Seconds between keepalive pings')
+    parser.add_argument('--ping-timeout', type=float, help='Seconds to wait for a pong')
+    parser.add_argument('--close-timeout', type=float, help='Seconds to wait for the closing handshake')
     return parser.parse_args()
 
 # main entry point
@@ -193,7 +409,18 @@ if __name__ == "__main__":
         # Parse command line arguments
         args = parse_args()
 
-        asyncio.run(main(args))
+        if args.workers > 1 and not hasattr(socket, "SO_REUSEPORT"):
+            logger.warning("SO_REUSEPORT is not available on this platform; running a single process")
+            args.workers = 1
+
+        websocket_config = build_websocket_config(args)
+        loop_name = install_event_loop(websocket_config.event_loop)
+        logger.info(f"Using {loop_name} event loop")
+
+        if args.workers > 1:
+            run_workers(args, websocket_config)
+        else:
+            asyncio.run(main(args, websocket_config))
     except KeyboardInterrupt:
         logger.info("Server stopped by keyboard interrupt")
     except Exception as e:
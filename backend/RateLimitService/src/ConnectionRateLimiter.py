@@ -0,0 +1,125 @@
+import logging
+import time
+from typing import Dict, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Close code for connections that keep exceeding their message budget (application-defined range)
+RATE_LIMIT_CLOSE_CODE = 4029
+RATE_LIMIT_CLOSE_REASON = "Rate limit exceeded"
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `burst`; each frame takes one."""
+    __slots__ = ("rate", "burst", "tokens", "updated_at")
+
+    def __init__(self, rate: float, burst: float, now: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+    def consume(self, now: float, cost: float = 1.0) -> bool:
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+class ConnectionRateLimiter:
+    """
+    In-memory per-connection message rate limiting for the websocket relay.
+
+    Unlike RateLimitService (HTTP, fixed windows in Redis) this never touches Redis: every
+    connection only ever talks to one server process, so its buckets can live in memory.
+    Each client gets one token bucket per action class (e.g. control messages, player
+    frames, host frames), created on first use and dropped with forget() on disconnect.
+
+    Frames over budget are rejected and counted. should_notify() is True for the first rejected
+    frame of each burst, so the sender can be told once instead of per frame. Rejections decay at
+    max_violations per violation_window seconds; only a client that reaches max_violations within
+    about one window (a sustained flood, not an occasional burst) is told to disconnect by
+    should_disconnect().
+    """
+
+    def __init__(self, limits: Dict[str, Tuple[float, float]], max_violations: int = 0, violation_window: float = 10.0):
+        """
+        Args:
+            limits: Action class -> (messages per second, burst). Classes not listed are unlimited.
+            max_violations: Rejected frames within violation_window after which the client should
+                be disconnected (0 = never)
+            violation_window: Seconds over which max_violations rejections decay away
+        """
+        self.limits = limits
+        self.max_violations = max_violations
+        self.violation_window = violation_window
+        # Client ID -> {action class: TokenBucket}
+        self._buckets = {}
+        # Client ID -> [decaying rejected-frame count, monotonic time of last update]
+        self._violations = {}
+        # Clients whose current burst of rejections has been reported / that were told to disconnect
+        self._notified = set()
+        self._disconnecting = set()
+
+        # Stats (lifetime, per action class)
+        self.rejected = {action_class: 0 for action_class in limits}
+        self.disconnected = 0
+
+    def allow(self, client_id: str, action_class: str) -> bool:
+        """Take one token from the client's bucket for this class; False if the frame must be dropped."""
+        limit = self.limits.get(action_class)
+        if limit is None:
+            return True
+        now = time.monotonic()
+        buckets = self._buckets.setdefault(client_id, {})
+        bucket = buckets.get(action_class)
+        if bucket is None:
+            bucket = buckets[action_class] = TokenBucket(limit[0], limit[1], now)
+        if bucket.consume(now):
+            if self._notified:
+                self._notified.discard(client_id)
+            return True
+        self.rejected[action_class] += 1
+        violations = self._violations.get(client_id)
+        if violations is None:
+            violations = self._violations[client_id] = [0.0, now]
+            logger.warning(f"Client {client_id} exceeded its {action_class} message rate ({limit[0]}/s, burst {limit[1]})")
+        elif self.max_violations and self.violation_window > 0:
+            decay = (now - violations[1]) * self.max_violations / self.violation_window
+            violations[0] = max(0.0, violations[0] - decay)
+        violations[0] += 1
+        violations[1] = now
+        return False
+
+    def should_notify(self, client_id: str) -> bool:
+        """Checks if this is the first rejected frame since the client's last accepted one."""
+        if client_id in self._notified:
+            return False
+        self._notified.add(client_id)
+        return True
+
+    def should_disconnect(self, client_id: str) -> bool:
+        """Checks if the client just reached max_violations within the window (True once per connection)."""
+        if not self.max_violations or client_id in self._disconnecting:
+            return False
+        violations = self._violations.get(client_id)
+        if violations is None or violations[0] < self.max_violations:
+            return False
+        self._disconnecting.add(client_id)
+        self.disconnected += 1
+        return True
+
+    def forget(self, client_id: str):
+        """Drop a disconnected client's buckets."""
+        self._buckets.pop(client_id, None)
+        self._violations.pop(client_id, None)
+        self._notified.discard(client_id)
+        self._disconnecting.discard(client_id)
+
+    def stats(self) -> dict:
+        """Current metrics (served on /metrics)."""
+        return {
+            "clients": len(self._buckets),
+            "rejected": dict(self.rejected),
+            "disconnected": self.disconnected,
+        }
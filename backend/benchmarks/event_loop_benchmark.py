@@ -0,0 +1,130 @@
+"""
+Event loop benchmark for the websocket server: asyncio's default loop vs uvloop.
+
+For each loop, a fresh process runs a websockets server configured from WebSocketConfig
+(the same serve options as MultiplayerServer) and a client load generator, and measures:
+
+  - connections/s: websocket handshakes completed by concurrent connecting clients
+  - relay msgs/s:  messages from one sender fanned out by the server to every other client
+                   (the relay's hot path: receive one frame, write it to N sockets)
+
+Redis is not involved, so the numbers isolate the loop, the websocket framing and the
+socket writes. Server and clients share one process (and core), as in a single worker.
+
+Usage (from backend/):
+    python benchmarks/event_loop_benchmark.py --connections 1000 --receivers 100 --messages 2000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import websockets
+
+from configuration.WebSocketConfig import WebSocketConfig
+
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+PAYLOAD = '{"action":"timerUpdate","timeRemaining":27,"senderId":"auth_guest_3f2a9c1e_5d8b7a21"}'
+
+
+async def run_benchmark(args) -> dict:
+    clients = set()
+
+    async def relay(websocket):
+        clients.add(websocket)
+        try:
+            async for message in websocket:
+                for client in list(clients):
+                    if client is not websocket:
+                        try:
+                            await client.send(message)
+                        except websockets.ConnectionClosed:
+                            pass
+        finally:
+            clients.discard(websocket)
+
+    serve_options = WebSocketConfig().get_serve_options()
+    async with websockets.serve(relay, "127.0.0.1", 0, compression=None, **serve_options) as server:
+        port = server.sockets[0].getsockname()[1]
+        uri = f"ws://127.0.0.1:{port}"
+
+        # 1) Connection rate
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def connect_once():
+            async with semaphore:
+                websocket = await websockets.connect(uri, compression=None)
+                await websocket.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connect_once() for _ in range(args.connections)))
+        connections_per_second = args.connections / (time.perf_counter() - started)
+
+        # 2) Relay throughput (fan-out from one sender)
+        receivers = [await websockets.connect(uri, compression=None) for _ in range(args.receivers)]
+        sender = await websockets.connect(uri, compression=None)
+        while len(clients) < args.receivers + 1:
+            await asyncio.sleep(0.01)
+
+        async def receive_all(websocket):
+            for _ in range(args.messages):
+                await websocket.recv()
+
+        started = time.perf_counter()
+        receiving = asyncio.gather(*(receive_all(websocket) for websocket in receivers))
+        for _ in range(args.messages):
+            await sender.send(PAYLOAD)
+        await receiving
+        relay_per_second = args.messages * args.receivers / (time.perf_counter() - started)
+
+        for websocket in receivers + [sender]:
+            await websocket.close()
+
+    return {"connections": connections_per_second, "relay": relay_per_second}
+
+
+def worker(loop_name: str, args, results):
+    if loop_name == "uvloop":
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    results[loop_name] = asyncio.run(run_benchmark(args))
+
+
+def main(args):
+    loops = ["asyncio"] + (["uvloop"] if uvloop is not None else [])
+    if uvloop is None:
+        print("uvloop is not installed; measuring asyncio only")
+
+    with multiprocessing.Manager() as manager:
+        results = manager.dict()
+        for loop_name in loops:
+            # Separate process per loop, so neither run inherits the other's loop or sockets
+            process = multiprocessing.Process(target=worker, args=(loop_name, args, results))
+            process.start()
+            process.join()
+        results = dict(results)
+
+    print(f"{'loop':<8} {'conn/s':>10} {'relay msg/s':>12}")
+    for loop_name in loops:
+        r = results.get(loop_name)
+        if r:
+            print(f"{loop_name:<8} {r['connections']:>10.0f} {r['relay']:>12.0f}")
+    if len(results) == 2:
+        print(f"uvloop speedup: connections {results['uvloop']['connections'] / results['asyncio']['connections']:.2f}x, "
+              f"relay {results['uvloop']['relay'] / results['asyncio']['relay']:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="asyncio vs uvloop websocket server benchmark")
+    parser.add_argument("--connections", type=int, default=1000, help="Handshakes for the connection-rate test")
+    parser.add_argument("--concurrency", type=int, default=50, help="Clients connecting at the same time")
+    parser.add_argument("--receivers", type=int, default=100, help="Clients receiving each relayed message")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages sent by the relay sender")
+    main(parser.parse_args())
@@ -0,0 +1,136 @@
+"""
+Ordered delivery stress test for per-channel sequence numbers.
+
+Runs several MessageService instances (as separate servers would) against one Redis, with
+clients on each of them subscribed to the same game channel, and lets many concurrent
+publishers hammer that channel through all instances at once. Afterwards every client's
+stream is checked:
+
+  - "seq" increases by exactly one per message (in order, no gaps, no duplicates)
+  - every client saw the same messages in the same order
+  - each publisher's own messages arrived in the order it published them
+
+Exits with status 1 if any check fails.
+
+Requires a reachable Redis (REDIS_URL or REDIS_HOST/REDIS_PORT, same as the servers).
+
+Usage (from backend/):
+    python benchmarks/ordering_stress.py --servers 3 --publishers 20 --messages 200
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from websockets.protocol import State
+
+from commons.adapters.RedisAdapter import RedisAdapter
+from configuration.RedisConfig import RedisConfig
+from configuration.RelayConfig import RelayConfig
+from MessageService.MessageService import MessageService
+
+
+class RecordingWebSocket:
+    """Stand-in websocket that records every message it is sent."""
+
+    def __init__(self):
+        self.state = State.OPEN
+        self.close_code = None
+        self.messages = []
+
+    async def send(self, message, text=None):
+        self.messages.append(json.loads(message))
+
+
+async def publisher(message_service: MessageService, channel: str, publisher_id: int, messages: int):
+    for i in range(messages):
+        await message_service.publish_raw(channel, json.dumps({"action": "stress", "publisher": publisher_id, "i": i}))
+        if i % 10 == 0:
+            await asyncio.sleep(0)
+
+
+def check_client(name: str, received: list, expected_total: int) -> list:
+    """Returns a list of problems found in one client's message stream."""
+    problems = []
+    if len(received) != expected_total:
+        problems.append(f"{name}: received {len(received)} of {expected_total} messages")
+    seqs = [m.get("seq") for m in received]
+    for previous, current in zip(seqs, seqs[1:]):
+        if current != previous + 1:
+            problems.append(f"{name}: seq {previous} followed by {current}")
+            break
+    last_index = {}
+    for m in received:
+        if m["i"] <= last_index.get(m["publisher"], -1):
+            problems.append(f"{name}: publisher {m['publisher']} message {m['i']} after {last_index[m['publisher']]}")
+            break
+        last_index[m["publisher"]] = m["i"]
+    return problems
+
+
+async def main(args):
+    relay_config = RelayConfig()
+    relay_config.ordered_delivery = True
+    # Recording clients never fall behind for long; keep bursts from evicting them as slow consumers
+    relay_config.outbox_max_depth = 1 << 20
+    relay_config.outbox_max_bytes = 1 << 30
+
+    channel = f"game:stress-{os.getpid()}:broadcast"
+    services, adapters, clients = [], [], []
+    for s in range(args.servers):
+        redis_adapter = RedisAdapter(redis_config=RedisConfig())
+        message_service = await MessageService(redis_adapter, relay_config).start()
+        for c in range(args.clients):
+            websocket = RecordingWebSocket()
+            await message_service.subscribe_client(f"server{s}-client{c}", channel, websocket)
+            clients.append((f"server{s}-client{c}", websocket))
+        services.append(message_service)
+        adapters.append(redis_adapter)
+    await asyncio.sleep(0.2)  # let the subscriptions settle
+
+    expected_total = args.publishers * args.messages
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        publisher(services[p % len(services)], channel, p, args.messages) for p in range(args.publishers)
+    ))
+
+    deadline = time.monotonic() + 10
+    while any(len(ws.messages) < expected_total for _, ws in clients) and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    problems = []
+    for name, websocket in clients:
+        problems.extend(check_client(name, websocket.messages, expected_total))
+    reference = [m["seq"] for m in clients[0][1].messages]
+    for name, websocket in clients[1:]:
+        if [m["seq"] for m in websocket.messages] != reference:
+            problems.append(f"{name}: order differs from {clients[0][0]}")
+
+    for message_service in services:
+        print(f"{message_service.server_id}: {message_service.sequence_stats.snapshot()}")
+        await message_service.stop()
+    for redis_adapter in adapters:
+        await redis_adapter.close()
+
+    print(f"{expected_total} messages x {len(clients)} clients in {elapsed:.2f}s")
+    if problems:
+        for problem in problems[:20]:
+            print(f"FAIL {problem}")
+        sys.exit(1)
+    print("OK: every client received every message in sequence order")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Per-channel ordered delivery stress test")
+    parser.add_argument("--servers", type=int, default=3, help="MessageService instances sharing the channel")
+    parser.add_argument("--clients", type=int, default=5, help="Subscribed clients per instance")
+    parser.add_argument("--publishers", type=int, default=20, help="Concurrent publishers (spread over the instances)")
+    parser.add_argument("--messages", type=int, default=200, help="Messages per publisher")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,101 @@
+"""
+Relay latency benchmark for the MessageService pub/sub listener.
+
+Publishes timestamped messages through Redis and measures the time until MessageService
+hands them to a subscribed (in-memory) websocket, once per listener mode, then prints
+p50/p99 latencies side by side.
+
+Requires a reachable Redis (REDIS_URL or REDIS_HOST/REDIS_PORT, same as the servers).
+
+Usage (from backend/):
+    python benchmarks/pubsub_latency_benchmark.py --messages 2000 --rate 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from websockets.protocol import State
+
+from commons.adapters.RedisAdapter import RedisAdapter
+from configuration.RedisConfig import RedisConfig
+from configuration.RelayConfig import RelayConfig
+from MessageService.MessageService import MessageService
+
+
+class RecordingWebSocket:
+    """Stand-in websocket that records when each message was delivered."""
+
+    def __init__(self):
+        self.state = State.OPEN
+        self.close_code = None
+        self.latencies_ms = []
+
+    async def send(self, message, text=None):
+        received_at = time.perf_counter()
+        sent_at = json.loads(message)["sentAt"]
+        self.latencies_ms.append((received_at - sent_at) * 1000)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(mode: str, messages: int, rate: int) -> dict:
+    relay_config = RelayConfig()
+    relay_config.listener_mode = mode
+
+    redis_adapter = RedisAdapter(redis_config=RedisConfig())
+    message_service = MessageService(redis_adapter, relay_config)
+    await message_service.start()
+
+    channel = f"game:bench-{mode}-{os.getpid()}:broadcast"
+    websocket = RecordingWebSocket()
+    await message_service.subscribe_client("bench-client", channel, websocket)
+    await asyncio.sleep(0.2)  # let the subscription settle
+
+    interval = 1.0 / rate if rate > 0 else 0
+    for i in range(messages):
+        payload = json.dumps({"action": "timerUpdate", "seq": i, "sentAt": time.perf_counter()})
+        await redis_adapter.publish(channel, payload)
+        if interval:
+            await asyncio.sleep(interval)
+
+    deadline = time.monotonic() + 10
+    while len(websocket.latencies_ms) < messages and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+
+    await message_service.stop()
+    await redis_adapter.close()
+
+    latencies = websocket.latencies_ms
+    return {
+        "mode": mode,
+        "delivered": len(latencies),
+        "p50": percentile(latencies, 50) if latencies else float("nan"),
+        "p99": percentile(latencies, 99) if latencies else float("nan"),
+        "mean": statistics.fmean(latencies) if latencies else float("nan"),
+    }
+
+
+async def main(args):
+    results = [await run_mode(mode, args.messages, args.rate) for mode in RelayConfig.LISTENER_MODES]
+    print(f"{'mode':<6} {'delivered':>10} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for r in results:
+        print(f"{r['mode']:<6} {r['delivered']:>10} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['mean']:>8.2f}")
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="MessageService pub/sub listener latency benchmark")
+    parser.add_argument("--messages", type=int, default=2000, help="Messages to publish per mode")
+    parser.add_argument("--rate", type=int, default=500, help="Publish rate in messages/second (0 = unthrottled)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Per-message CPU benchmark for the ConnectionService relay step.
+
+Compares the full-parse path (loads -> copy -> add senderId -> dumps) with the zero-parse
+fast path (control-action substring scan + MessageEnvelope.splice_encoded) on representative
+game frames. Both go through the same SerializerAdapter as ConnectionService (orjson when it
+is installed). No Redis or network involved - only the per-frame CPU work.
+
+Usage (from backend/):
+    python benchmarks/relay_fast_path_benchmark.py --iterations 200000
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ConnectionService.ConnectionService import ConnectionService
+from MessageService.src.MessageEnvelope import MessageEnvelope
+from commons.adapters.SerializerAdapter import SerializerAdapter
+
+SENDER_ID = "auth_guest_3f2a9c1e_5d8b7a21"
+
+PAYLOADS = {
+    "timerUpdate": json.dumps({"action": "timerUpdate", "timeRemaining": 27}),
+    "submitAnswer": json.dumps({
+        "action": "submitAnswer",
+        "playerId": "auth_guest_3f2a9c1e_5d8b7a21",
+        "answers": ["apple", "avocado", "apricot", "artichoke", "arugula"],
+        "timestamp": 1718037465123,
+    }),
+    "triviaQuestion": json.dumps({
+        "action": "nextQuestion",
+        "questionIndex": 7,
+        "question": {
+            "text": "Which planet in our solar system has the longest day relative to its year?",
+            "options": ["Mercury", "Venus", "Mars", "Jupiter"],
+            "answerIndex": 1,
+        },
+        "timeLimit": 20,
+    }),
+    "gameStateUpdate": json.dumps({
+        "action": "gameStateUpdate",
+        "gameState": {
+            "gamePhase": "results",
+            "currentRound": 3,
+            "currentCategory": {"name": "Fruits", "letter": "A"},
+            "timeRemaining": 0,
+            "playerScores": {f"player_{i}": i * 10 for i in range(40)},
+            "roundResults": {f"player_{i}": {"answers": ["apple", "apricot"], "score": 20} for i in range(40)},
+        },
+    }),
+}
+
+CONTROL_MARKERS = tuple(f'"{action}"' for action in ConnectionService.CONTROL_ACTIONS)
+SERIALIZER = SerializerAdapter()
+# Encoded once per connection, as in ConnectionService
+SENDER_FIELDS = MessageEnvelope.encode_fields({"senderId": SENDER_ID})
+
+
+def full_parse(message: str) -> str:
+    data = SERIALIZER.loads(message)
+    data.get("action")
+    data_to_publish = data.copy()
+    data_to_publish["senderId"] = SENDER_ID
+    return SERIALIZER.dumps(data_to_publish)
+
+
+def fast_path(message: str) -> str:
+    if any(marker in message for marker in CONTROL_MARKERS):
+        return full_parse(message)
+    return MessageEnvelope.splice_encoded(message, SENDER_FIELDS)
+
+
+def main(args):
+    print(f"serializer: {SERIALIZER.backend}")
+    print(f"{'payload':<16} {'bytes':>6} {'full us':>9} {'fast us':>9} {'speedup':>8}")
+    for name, message in PAYLOADS.items():
+        assert json.loads(fast_path(message)) == json.loads(full_parse(message))
+        full = timeit.timeit(lambda: full_parse(message), number=args.iterations) / args.iterations * 1e6
+        fast = timeit.timeit(lambda: fast_path(message), number=args.iterations) / args.iterations * 1e6
+        print(f"{name:<16} {len(message):>6} {full:>9.2f} {fast:>9.2f} {full / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Relay fast path vs full parse CPU benchmark")
+    parser.add_argument("--iterations", type=int, default=200000, help="Iterations per payload")
+    main(parser.parse_args())
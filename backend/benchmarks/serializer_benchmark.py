@@ -0,0 +1,81 @@
+"""
+Encode/decode micro-benchmark for SerializerAdapter: stdlib json vs orjson.
+
+Runs the same SerializerAdapter calls the servers make (message dumps/loads and marked
+Redis values) on representative lobby, session and game-message payloads. No Redis or
+network involved - only the per-call CPU work.
+
+Usage (from backend/):
+    python benchmarks/serializer_benchmark.py --iterations 100000
+"""
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commons.adapters.SerializerAdapter import SerializerAdapter
+
+PAYLOADS = {
+    "session": {
+        "user_id": "auth_guest_3f2a9c1e_5d8b7a21",
+        "created_at": int(time.time()),
+        "metadata": {"login_method": "guest", "user_agent": "Mozilla/5.0 (iPhone; CPU iPhone OS 17_5 like Mac OS X)"},
+        "active": True,
+    },
+    "lobby": {
+        "gameId": "a1b2c3d4",
+        "hostId": "auth_host_77e0c2aa_19f3b6c4",
+        "gameType": "trivia",
+        "createdAt": int(time.time()),
+        "players": [f"auth_guest_{i:08x}_5d8b7a21" for i in range(12)],
+    },
+    "timerUpdate": {"action": "timerUpdate", "timeRemaining": 27, "senderId": "auth_host_77e0c2aa_19f3b6c4"},
+    "gameStateUpdate": {
+        "action": "gameStateUpdate",
+        "gameState": {
+            "gamePhase": "results",
+            "currentRound": 3,
+            "currentCategory": {"name": "Fruits", "letter": "A"},
+            "timeRemaining": 0,
+            "playerScores": {f"player_{i}": i * 10 for i in range(40)},
+            "roundResults": {f"player_{i}": {"answers": ["apple", "apricot"], "score": 20} for i in range(40)},
+        },
+    },
+}
+
+
+def bench(fn, iterations):
+    return timeit.timeit(fn, number=iterations) / iterations * 1e6
+
+
+def main(args):
+    stdlib = SerializerAdapter(use_orjson=False)
+    fast = SerializerAdapter()
+    if fast.backend != "orjson":
+        print("orjson is not installed; both columns use stdlib json")
+
+    print(f"{'payload':<16} {'op':<13} {'bytes':>6} {'json us':>9} {'orjson us':>10} {'speedup':>8}")
+    for name, obj in PAYLOADS.items():
+        encoded = stdlib.dumps(obj)
+        value = stdlib.encode_value(obj)
+        assert fast.loads(encoded) == stdlib.loads(encoded) == obj
+        assert fast.decode_value(value) == obj
+        ops = {
+            "dumps": lambda s: s.dumps(obj),
+            "loads": lambda s: s.loads(encoded),
+            "encode_value": lambda s: s.encode_value(obj),
+            "decode_value": lambda s: s.decode_value(value),
+        }
+        for op, call in ops.items():
+            slow_us = bench(lambda: call(stdlib), args.iterations)
+            fast_us = bench(lambda: call(fast), args.iterations)
+            print(f"{name:<16} {op:<13} {len(encoded):>6} {slow_us:>9.2f} {fast_us:>10.2f} {slow_us / fast_us:>7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SerializerAdapter json vs orjson CPU benchmark")
+    parser.add_argument("--iterations", type=int, default=100000, help="Iterations per payload and operation")
+    main(parser.parse_args())
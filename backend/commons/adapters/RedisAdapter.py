@@ -1,6 +1,5 @@
 import redis
 from redis.sentinel import Sentinel
-import json
 import asyncio
 import logging
 from redis.exceptions import RedisError
@@ -9,6 +8,7 @@ from redis.typing import KeyT, EncodableT
 from configuration.AppConfig import AppConfig, Stage
 import os
 from configuration.RedisConfig import RedisConfig
+from commons.adapters.SerializerAdapter import SerializerAdapter
 from typing import Any
 
 logger = logging.getLogger(__name__)
@@ -27,10 +27,15 @@ class RedisAdapter:
 
 
     '''
-    def __init__(self, app_config: AppConfig = None, redis_config: RedisConfig = None):
+    def __init__(self, app_config: AppConfig = None, redis_config: RedisConfig = None, serializer: SerializerAdapter = None):
         # Ensure one of the configs is provided
         if app_config is None and redis_config is None:
             raise ValueError("Either app_config or redis_config must be provided")
+
+        # Encodes dict/list values with an explicit type marker (see SerializerAdapter)
+        self.serializer = serializer or SerializerAdapter(
+            legacy_json_fallback=redis_config.legacy_json_fallback if redis_config is not None else True
+        )
         
         # If RedisConfig is provided, use it directly
         if redis_config is not None:
@@ -119,6 +124,7 @@ class RedisAdapter:
         self.async_pool = None
         self._sync_client = None
         self._async_client = None
+        self._raw_async_client = None
 
     @property # lazy initialization, meaning the client is not created until it is needed.
     def sync_client(self):
@@ -151,48 +157,62 @@ class RedisAdapter:
         used like that, so with the client object, we can use redis operations.
         '''
         if self._async_client is None:
-            try:
-                if self.use_redis_config and hasattr(self, 'redis_url') and self.redis_url:
-                    # Use from_url for Redis URLs (handles SSL automatically for rediss://)
-                    # For Heroku Redis, disable SSL certificate verification as they use self-signed certs
-                    self._async_client = Redis.from_url(
-                        self.redis_url,
-                        decode_responses=True,
-                        socket_timeout=self.redis_config.socket_timeout,
-                        ssl_cert_reqs=None,  # Disable SSL certificate verification for Heroku Redis
-                        ssl_check_hostname=False,  # Don't verify hostname
-                        ssl_ca_certs=None  # Don't use CA certificates
-                    )
-                    logger.debug(f"Initialized async Redis client from URL: {self.redis_url[:20]}...")
-                elif self.use_sentinel:
-                    # For async Sentinel, we need to get master info and create async connection
-                    master_info = self.sentinel.discover_master(self.sentinel_service)
-                    host, port = master_info
-
-                    if self.async_pool is None:
-                        self.async_pool = ConnectionPool(
-                            host=host,
-                            port=port,
-                            decode_responses=True,
-                            socket_timeout=10
-                        )
-                        logger.debug(f"Initialized async Redis pool via Sentinel to {host}:{port}")
-
-                    self._async_client = Redis(connection_pool=self.async_pool)
-                    logger.debug("Initialized async Redis client via Sentinel")
-                else:
-                    # Direct connection (original logic)
-                    if self.async_pool is None:
-                        self.async_pool = ConnectionPool(**self.config)
-                        logger.debug("Initialized async Redis connection pool")
+            self._async_client = self._create_async_client(decode_responses=True)
+        return self._async_client
 
-                    self._async_client = Redis(connection_pool=self.async_pool)
-                    logger.debug("Initialized async Redis client directly")
-            except RedisError as e:
-                logger.error(f"Failed to initialize async Redis client: {e}")
-                raise
+    @property
+    async def raw_async_client(self):
+        '''Same as async_client but returns bytes (decode_responses=False).
 
-        return self._async_client
+        Used for hot paths that forward payloads as-is (e.g. pub/sub to websockets),
+        so no intermediate str objects are created per message.
+        '''
+        if self._raw_async_client is None:
+            self._raw_async_client = self._create_async_client(decode_responses=False)
+        return self._raw_async_client
+
+    def _create_async_client(self, decode_responses: bool):
+        """Create an async client (with its own connection pool) for the configured Redis."""
+        try:
+            if self.use_redis_config and hasattr(self, 'redis_url') and self.redis_url:
+                # Use from_url for Redis URLs (handles SSL automatically for rediss://)
+                # For Heroku Redis, disable SSL certificate verification as they use self-signed certs
+                client = Redis.from_url(
+                    self.redis_url,
+                    decode_responses=decode_responses,
+                    socket_timeout=self.redis_config.socket_timeout,
+                    ssl_cert_reqs=None,  # Disable SSL certificate verification for Heroku Redis
+                    ssl_check_hostname=False,  # Don't verify hostname
+                    ssl_ca_certs=None  # Don't use CA certificates
+                )
+                logger.debug(f"Initialized async Redis client from URL: {self.redis_url[:20]}...")
+            elif self.use_sentinel:
+                # For async Sentinel, we need to get master info and create async connection
+                master_info = self.sentinel.discover_master(self.sentinel_service)
+                host, port = master_info
+
+                pool = ConnectionPool(
+                    host=host,
+                    port=port,
+                    decode_responses=decode_responses,
+                    socket_timeout=10
+                )
+                logger.debug(f"Initialized async Redis pool via Sentinel to {host}:{port}")
+                client = Redis(connection_pool=pool)
+                logger.debug("Initialized async Redis client via Sentinel")
+            else:
+                # Direct connection (original logic)
+                pool = ConnectionPool(**{**self.config, "decode_responses": decode_responses})
+                logger.debug("Initialized async Redis connection pool")
+                client = Redis(connection_pool=pool)
+                logger.debug("Initialized async Redis client directly")
+        except RedisError as e:
+            logger.error(f"Failed to initialize async Redis client: {e}")
+            raise
+
+        if decode_responses:
+            self.async_pool = client.connection_pool
+        return client
 
     async def pipeline(self, transaction=True):
         """
@@ -252,9 +272,8 @@ class RedisAdapter:
         try:
             client = await self.async_client
 
-            # Handle JSON serialization if value is dict or list
-            if isinstance(value, (dict, list)):
-                value = json.dumps(value)
+            # dict/list values are stored as marked JSON
+            value = self.serializer.encode_value(value)
 
             return await client.set(key, value, ex=ex)
         except RedisError as e:
@@ -262,7 +281,7 @@ class RedisAdapter:
             return False
 
     async def get(self, key, default=None):
-        """Get a value by key with automatic JSON deserialization if applicable"""
+        """Get a value by key; values stored as dict/list come back as dict/list"""
         try:
             client = await self.async_client
             value = await client.get(key)
@@ -270,15 +289,7 @@ class RedisAdapter:
             if value is None:
                 return default
 
-            # Try to deserialize JSON if it looks like JSON
-            try:
-                if value.startswith('{') and value.endswith('}') or \
-                   value.startswith('[') and value.endswith(']'):
-                    return json.loads(value)
-            except (json.JSONDecodeError, AttributeError):
-                pass
-
-            return value
+            return self.serializer.decode_value(value)
         except RedisError as e:
             logger.error(f"Redis error in get operation for key {key}: {e}")
             return default
@@ -287,7 +298,7 @@ class RedisAdapter:
     # used for lobby metadata for reconnection logic
 
     async def hgetall(self, name):
-        """Get all fields and values in a hash, robustly handling decoding and JSON deserialization."""
+        """Get all fields and values in a hash, decoding values stored as dict/list."""
         try:
             client = await self.async_client # Use the main client (decode_responses=True)
             raw_values = await client.hgetall(name)
@@ -300,25 +311,8 @@ class RedisAdapter:
             for k_raw, v_raw in raw_values.items():
                 # Decode key if it's bytes
                 k = k_raw.decode('utf-8') if isinstance(k_raw, bytes) else k_raw
-                # Decode value if it's bytes
-                v_str = v_raw.decode('utf-8') if isinstance(v_raw, bytes) else v_raw
-
-                # Ensure we have a string before checking for JSON
-                if not isinstance(v_str, str):
-                    # Log unexpected type or handle appropriately
-                    logger.warning(f"Unexpected value type ({type(v_str)}) for key {k} in hgetall({name}). Skipping JSON check.")
-                    result[k] = v_str # Keep original value if not string
-                    continue
-
-                # Try to deserialize JSON if it looks like JSON
-                try:
-                    if v_str.startswith('{') and v_str.endswith('}') or \
-                       v_str.startswith('[') and v_str.endswith(']'):
-                        result[k] = json.loads(v_str)
-                    else:
-                        result[k] = v_str
-                except json.JSONDecodeError:
-                    result[k] = v_str # Fallback: keep decoded string
+                # Marked dict/list values are parsed, everything else stays a string
+                result[k] = self.serializer.decode_value(v_raw)
 
             return result
         except RedisError as e:
@@ -331,8 +325,7 @@ class RedisAdapter:
             client = await self.async_client
             # aioredis hmset expects a mapping directly
             # Ensure values are encodable (str, bytes, int, float)
-            encoded_mapping = {k: json.dumps(v) if isinstance(v, (dict, list)) else v
-                               for k, v in mapping.items()}
+            encoded_mapping = {k: self.serializer.encode_value(v) for k, v in mapping.items()}
             return await client.hmset(name, mapping=encoded_mapping)
         except RedisError as e:
             logger.error(f"Redis error in hmset operation for hash {name}: {e}")
@@ -341,6 +334,15 @@ class RedisAdapter:
              logger.error(f"Type error during hmset serialization for hash {name}: {e}. Mapping: {mapping}")
              return False
 
+    async def hdel(self, name: KeyT, *keys) -> int:
+        """Delete one or more hash fields"""
+        if not keys: return 0
+        try:
+            client = await self.async_client
+            return await client.hdel(name, *keys)
+        except RedisError as e:
+            logger.error(f"Redis error in hdel operation for hash {name}: {e}")
+            return 0
 
     # --- Set Operations ---
     async def sadd(self, name: KeyT, *values: EncodableT) -> int:
@@ -386,9 +388,9 @@ class RedisAdapter:
         try:
             client = await self.async_client
 
-            # Handle JSON serialization if message is dict or list
+            # Handle JSON serialization if message is dict or list (messages carry no type marker)
             if isinstance(message, (dict, list)):
-                message = json.dumps(message)
+                message = self.serializer.dumps(message)
 
             return await client.publish(channel, message)
         except RedisError as e:
@@ -421,6 +423,72 @@ class RedisAdapter:
             logger.error(f"Redis error in subscribe operation for channels {channels}: {e}")
             raise
 
+    async def pubsub(self, decode_responses: bool = True):
+        """
+        Create a pubsub object without subscribing to anything yet.
+        With decode_responses=False channels and payloads come back as raw bytes.
+
+        Channels are added and removed later with pubsub.subscribe()/pubsub.unsubscribe(),
+        so a single pubsub (one Redis connection) can multiplex any number of channels.
+
+        EX:
+        pubsub = await redis.pubsub()
+        await pubsub.subscribe("game:123:broadcast")
+        await pubsub.subscribe("game:456:broadcast") # same connection
+        await pubsub.unsubscribe("game:123:broadcast")
+        """
+        try:
+            client = await (self.async_client if decode_responses else self.raw_async_client)
+            return client.pubsub()
+        except RedisError as e:
+            logger.error(f"Redis error creating pubsub object: {e}")
+            raise
+
+    # --- Stream Operations ---
+    # (append-only log, unlike pub/sub messages are kept and can be re-read by offset)
+
+    async def xread(self, streams: dict, count: int = None):
+        """
+        Read entries newer than the given IDs (exclusive) from one or more streams.
+
+        EX:
+        await redis.xread({"stream:game:123:broadcast": "1700000000000-0"}, count=100)
+        -> [["stream:game:123:broadcast", [("1700000000001-0", {"m": "..."}), ...]]]
+        """
+        try:
+            client = await self.async_client
+            return await client.xread(streams, count=count)
+        except RedisError as e:
+            logger.error(f"Redis error in xread operation for streams {list(streams)}: {e}")
+            return []
+
+    async def xrange(self, name: KeyT, min: str = "-", max: str = "+", count: int = None):
+        """Get stream entries between two IDs (inclusive), oldest first."""
+        try:
+            client = await self.async_client
+            return await client.xrange(name, min=min, max=max, count=count)
+        except RedisError as e:
+            logger.error(f"Redis error in xrange operation for stream {name}: {e}")
+            return []
+
+    # --- Lua Scripts ---
+
+    async def register_script(self, script: str):
+        """
+        Register a Lua script and return a callable that runs it atomically on Redis
+        (EVALSHA, falling back to EVAL the first time).
+
+        EX:
+        incr_and_get = await redis.register_script("return redis.call('INCR', KEYS[1])")
+        value = await incr_and_get(keys=["counter"])
+        """
+        try:
+            client = await self.async_client
+            return client.register_script(script)
+        except RedisError as e:
+            logger.error(f"Redis error registering Lua script: {e}")
+            raise
+
     # Connection health check
     async def ping(self):
         """Test if Redis connection is alive"""
@@ -451,6 +519,13 @@ class RedisAdapter:
             except RedisError as e:
                 logger.error(f"Error closing async Redis client: {e}")
 
+        if self._raw_async_client:
+            try:
+                await self._raw_async_client.close()
+                logger.debug("Closed raw async Redis client")
+            except RedisError as e:
+                logger.error(f"Error closing raw async Redis client: {e}")
+
         # Close sync client
         if self._sync_client:
             try:
@@ -0,0 +1,137 @@
+import json
+import logging
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # optional speedup; stdlib json is used when it is not installed
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional; only needed for the binary websocket subprotocol
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Prefix on Redis values that hold structured (dict/list) data encoded as JSON.
+# Plain strings and numbers are stored untouched so INCR, redis-cli and other readers still work.
+JSON_VALUE_MARKER = "\x00j"
+
+class SerializationError(ValueError):
+    """Raised when a binary (MessagePack) payload cannot be decoded."""
+
+class SerializerAdapter:
+    '''
+    wrapper around the JSON library used for Redis values and websocket/pub-sub messages.
+    Uses orjson when it is installed (several times faster, returns bytes), otherwise stdlib json.
+    Both produce compact output, so messages look the same whichever backend encoded them.
+    Objects orjson refuses but stdlib json accepts (non-str dict keys, integers over 64 bits)
+    are encoded with stdlib json.
+
+    Structured Redis values carry JSON_VALUE_MARKER so decode_value() knows what to parse,
+    instead of guessing from the first/last character.
+
+    EX:
+    serializer = SerializerAdapter()
+    raw = serializer.encode_value({"user_id": "u1"})   # '\\x00j{"user_id":"u1"}'
+    serializer.decode_value(raw)                        # {'user_id': 'u1'}
+    serializer.dumps({"action": "timerUpdate"})        # '{"action":"timerUpdate"}'
+    serializer.json_to_msgpack(b'{"action":"x"}')      # b'\\x81\\xa6action\\xa1x'
+    '''
+    def __init__(self, use_orjson: bool = True, legacy_json_fallback: bool = True):
+        """
+        Args:
+            use_orjson: Use orjson if available (False forces stdlib json, e.g. for benchmarks)
+            legacy_json_fallback: Also parse unmarked values that look like JSON objects/arrays
+                (RedisConfig: REDIS_LEGACY_JSON_FALLBACK). Values written before the marker existed
+                (sessions, lobby hashes) are still read correctly until they expire. Removal plan:
+                once legacy_fallback_hits stays at 0 for a full session lifetime (24h) set it to
+                false; the fallback and the setting are then deleted in the next release.
+        """
+        self.use_orjson = use_orjson and orjson is not None
+        self.legacy_json_fallback = legacy_json_fallback
+        self.backend = "orjson" if self.use_orjson else "json"
+        self.msgpack_available = msgpack is not None
+        # Unmarked values decoded as JSON by the legacy fallback (0 for a day = safe to turn it off)
+        self.legacy_fallback_hits = 0
+
+    # --- Messages ---
+
+    def dumps(self, obj: Any) -> str:
+        """Encode to a JSON string (websocket text frames, pub/sub messages)."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj).decode('utf-8')
+            except TypeError:
+                pass  # e.g. non-str keys; stdlib json accepts them
+        return json.dumps(obj, separators=(",", ":"))
+
+    def dumps_bytes(self, obj: Any) -> bytes:
+        """Encode to UTF-8 JSON bytes (skips the str round trip with orjson)."""
+        if self.use_orjson:
+            try:
+                return orjson.dumps(obj)
+            except TypeError:
+                pass  # e.g. non-str keys; stdlib json accepts them
+        return json.dumps(obj, separators=(",", ":")).encode('utf-8')
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        """Decode JSON from str or bytes. Raises ValueError on invalid input."""
+        if self.use_orjson:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    # --- MessagePack (binary websocket frames) ---
+
+    def pack(self, obj: Any) -> bytes:
+        """Encode to MessagePack."""
+        return msgpack.packb(obj)
+
+    def unpack(self, data: bytes) -> Any:
+        """Decode MessagePack. Raises SerializationError on invalid input."""
+        try:
+            return msgpack.unpackb(data)
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise SerializationError(f"Invalid MessagePack payload: {e}") from e
+
+    def msgpack_array(self, payloads: list) -> bytes:
+        """Join already-packed MessagePack values into one array without re-encoding them."""
+        return msgpack.Packer().pack_array_header(len(payloads)) + b"".join(payloads)
+
+    def json_to_msgpack(self, payload: Union[str, bytes]) -> bytes:
+        """Transcode an encoded JSON message to MessagePack (duplicate keys: last one wins)."""
+        return msgpack.packb(self.loads(payload))
+
+    # --- Redis Values ---
+
+    def encode_value(self, value: Any) -> Any:
+        """Encode a value for storing in Redis; dicts and lists get the JSON marker."""
+        if isinstance(value, (dict, list)):
+            return JSON_VALUE_MARKER + self.dumps(value)
+        return value
+
+    def decode_value(self, raw: Any) -> Any:
+        """Decode a value read from Redis (inverse of encode_value)."""
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8')
+        if not isinstance(raw, str):
+            return raw
+        if raw.startswith(JSON_VALUE_MARKER):
+            try:
+                return self.loads(raw[len(JSON_VALUE_MARKER):])
+            except ValueError as e:
+                logger.error(f"Corrupt JSON value in Redis: {e}")
+                return None
+        if self.legacy_json_fallback and self._looks_like_json(raw):
+            try:
+                value = self.loads(raw)
+            except ValueError:
+                return raw
+            self.legacy_fallback_hits += 1
+            return value
+        return raw
+
+    @staticmethod
+    def _looks_like_json(raw: str) -> bool:
+        return (raw.startswith('{') and raw.endswith('}')) or (raw.startswith('[') and raw.endswith(']'))
@@ -0,0 +1,59 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class AdmissionConfig:
+    '''
+    handles connection admission control for the multiplayer server.
+    every value has a sensible default and can be overridden with an environment variable.
+
+    Beyond the caps, new websocket handshakes are refused with 503 + Retry-After and, when
+    another node has room, the address of the least-loaded one.
+    '''
+    def __init__(self):
+        # --- Caps (per process, 0 = unlimited) ---
+        # Open websocket connections
+        self.max_connections = 10000
+        # Connections that have not authenticated yet
+        self.max_unauthenticated = 1000
+        # Seconds a connection may stay unauthenticated before it is closed (0 = no deadline)
+        self.auth_timeout = 10.0
+        # Seconds a rejected client is told to wait before retrying
+        self.retry_after = 5
+
+        # --- Load registry (Redis) ---
+        # Address clients are redirected to when they should use this node, e.g. wss://ws2.example.com
+        # (without it the node still reports load but is never suggested as a redirect)
+        self.public_url = None
+        # Seconds between load reports; a node whose report is older than load_stale_after is ignored
+        self.load_report_interval = 5.0
+        self.load_stale_after = 15.0
+
+        self._loadFromEnv()
+
+    def _loadFromEnv(self):
+        """Load admission configuration from environment variables"""
+        self.max_connections = self._getInt("ADMISSION_MAX_CONNECTIONS", self.max_connections)
+        self.max_unauthenticated = self._getInt("ADMISSION_MAX_UNAUTHENTICATED", self.max_unauthenticated)
+        self.auth_timeout = self._getFloat("ADMISSION_AUTH_TIMEOUT", self.auth_timeout)
+        self.retry_after = self._getInt("ADMISSION_RETRY_AFTER", self.retry_after)
+        self.public_url = os.environ.get("PUBLIC_WS_URL", self.public_url)
+        self.load_report_interval = self._getFloat("ADMISSION_LOAD_REPORT_INTERVAL", self.load_report_interval)
+        self.load_stale_after = self._getFloat("ADMISSION_LOAD_STALE_AFTER", self.load_stale_after)
+
+    @staticmethod
+    def _getInt(name, default):
+        """Safely parse an integer environment variable, falling back to the default"""
+        try:
+            return int(os.environ.get(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    @staticmethod
+    def _getFloat(name, default):
+        """Safely parse a float environment variable, falling back to the default"""
+        try:
+            return float(os.environ.get(name, default))
+        except (ValueError, TypeError):
+            return default
@@ -19,12 +19,19 @@ class RedisConfig:
         self._socketTimeout = 5
         self._ssl = False
         self._ssl_cert_reqs = None
+        # Decode unmarked JSON-looking values written before SerializerAdapter's value marker
+        # (temporary; see SerializerAdapter for the removal plan)
+        self._legacyJsonFallback = True
 
         # Try to load from environment variables
         self._loadFromEnv()
 
     def _loadFromEnv(self):
         """Load Redis configuration from environment variables"""
+        legacy_json_fallback = os.environ.get("REDIS_LEGACY_JSON_FALLBACK")
+        if legacy_json_fallback is not None:
+            self._legacyJsonFallback = legacy_json_fallback.strip().lower() in ("1", "true", "yes", "on")
+
         # Check for Heroku Redis URL format first
         redis_url = os.environ.get("REDIS_URL")
         if redis_url:
@@ -100,6 +107,10 @@ class RedisConfig:
     def ssl_cert_reqs(self):
         return self._ssl_cert_reqs
 
+    @property
+    def legacy_json_fallback(self):
+        return self._legacyJsonFallback
+
     def get_connection_params(self):
         """Get all connection parameters as a dictionary"""
         params = {
@@ -125,6 +136,11 @@ class RedisKeyPrefix(Enum):
     GAME = "game"
     PLAYER = "player"
     SESSION = "session"
+    STREAM = "stream"
+    GAME_STATE = "gamestate"
+    SEQUENCE = "seq"
+    SERVER_LOAD = "serverload"
+    HOST_GRACE = "hostgrace"
 
 class RedisChannelPrefix(Enum):
     '''for pub/sub'''
@@ -0,0 +1,209 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class RelayConfig:
+    '''
+    handles the tuning knobs of the websocket relay (MessageService + ConnectionService).
+    every value has a sensible default and can be overridden with an environment variable,
+    so the same build can be tuned per deployment without code changes.
+    '''
+    LISTENER_MODES = ("push", "poll")
+    CHANNEL_BACKENDS = ("pubsub", "streams")
+    # Websocket subprotocol a client requests to get MessagePack binary frames instead of JSON text
+    MSGPACK_SUBPROTOCOL = "queueplay.msgpack"
+
+    def __init__(self):
+        # --- Pub/Sub listener ---
+        # "push": block on the PubSub socket and wake up only when data arrives (default)
+        # "poll": legacy 1s-timeout poll followed by a 10ms sleep per iteration
+        self.listener_mode = "push"
+        # Max seconds a push-mode read blocks before looping (keeps cancellation/health checks responsive)
+        self.listener_idle_timeout = 30.0
+
+        # --- Channel backend ---
+        # "pubsub": fire-and-forget Redis pub/sub (default)
+        # "streams": game channels are also appended to capped Redis Streams, so a reconnecting
+        #            client can send its last seen offsets and get only the missed messages
+        self.channel_backend = "pubsub"
+        self.stream_maxlen = 500                # approximate entries kept per game channel
+        self.stream_ttl = 3600                  # seconds an idle game channel's stream is kept
+
+        # --- Subscription linger ---
+        # Seconds a channel stays subscribed on Redis after its last local subscriber leaves, so
+        # clients reconnecting within that time reuse it (0 = unsubscribe immediately)
+        self.unsubscribe_linger = 15.0
+
+        # --- Server callbacks ---
+        # Server-side channel callbacks run on a worker pool instead of inside the listener;
+        # each channel sticks to one worker (in-order), each worker queues at most this many messages
+        self.callback_workers = 4
+        self.callback_queue_size = 1000
+
+        # --- Local delivery ---
+        # Deliver messages straight to subscribers on this server; Redis only reaches other servers
+        self.local_delivery = True
+
+        # --- Inbound relay ---
+        # Relay frames from identified clients without decoding them; senderId is spliced onto the
+        # raw JSON and only frames mentioning a control action are fully parsed
+        self.relay_fast_path = True
+
+        # --- Inbound rate limits ---
+        # In-memory token bucket per connection and action class: (messages per second, burst).
+        # "control" covers authenticate/identify/state actions, "player"/"host" the relayed frames
+        self.rate_limit_enabled = True
+        self.rate_limits = {"control": (5.0, 20.0), "player": (20.0, 40.0), "host": (60.0, 120.0)}
+        # Frames rejected within the violation window before the connection is closed
+        # (0 = only drop, never close); older rejections decay, so short bursts never add up
+        self.rate_limit_max_violations = 200
+        self.rate_limit_violation_window = 10.0  # seconds
+
+        # --- Per-client outbound queues ---
+        # A client is disconnected as a slow consumer once any of these limits is exceeded
+        self.outbox_max_depth = 256             # queued messages
+        self.outbox_max_bytes = 1024 * 1024     # queued payload bytes
+        self.outbox_max_lag = 5.0               # seconds the oldest queued message may wait
+
+        # --- Conflation ---
+        # Message actions that are latest-wins per client: a newer one replaces a still-queued older one
+        # (the replaced message's "seq" is then never delivered; that gap is intentional, not loss)
+        self.conflate_actions = frozenset({"timerUpdate", "gameStateUpdate"})
+
+        # --- Wire format ---
+        # Offer the MessagePack subprotocol during the handshake (needs the msgpack package);
+        # clients that do not ask for it keep using JSON text frames
+        self.msgpack_enabled = True
+
+        # --- Host fan-in batching ---
+        # Hosts may opt in (identify with batchWindowMs) to receive player messages from to_host
+        # coalesced into array frames; the requested window and size are capped by these values
+        self.host_batching_enabled = True
+        self.host_batch_max_window = 0.1        # seconds
+        self.host_batch_max_size = 64           # messages per frame
+
+        # --- State channel ---
+        # Hosts may send merge patches (statePatch) instead of whole game states; the server
+        # versions them, keeps the full snapshot in Redis and sends keyframes to new/lagging clients
+        self.state_sync_enabled = True
+        self.state_keyframe_interval = 50       # every Nth version is broadcast as a full keyframe (0 = never)
+        self.state_ttl = 3 * 3600               # seconds a game's snapshot is kept after its last patch
+
+        # --- Ordered delivery ---
+        # Game channel messages get a per-channel sequence number from Redis; each server holds
+        # back early arrivals so clients receive them in order and can spot gaps in "seq"
+        self.ordered_delivery = True
+        self.reorder_timeout = 0.25             # seconds to wait for a missing message before skipping it
+        self.reorder_max_pending = 256          # early messages held per channel before the gap is skipped
+        self.sequence_ttl = 24 * 3600           # seconds an idle channel's counter is kept
+
+        # --- Session resume ---
+        # Identified clients get a signed resume token; a reconnect presenting it gets the same
+        # client ID, role and subscriptions back in one frame instead of authenticate + identify
+        self.resume_enabled = True
+        self.resume_token_ttl = 600             # seconds a resume token stays valid after it was issued
+        # A disconnected host's game only ends (gameEnded) if the host has not resumed within this
+        # many seconds; players get "hostDisconnected" meanwhile. Later host resumes are refused.
+        self.host_resume_grace = 60.0
+
+        self._loadFromEnv()
+
+    def _loadFromEnv(self):
+        """Load relay configuration from environment variables"""
+        listener_mode = os.environ.get("PUBSUB_LISTENER_MODE", self.listener_mode).lower()
+        if listener_mode in self.LISTENER_MODES:
+            self.listener_mode = listener_mode
+        else:
+            logger.warning(f"Unknown PUBSUB_LISTENER_MODE '{listener_mode}', using '{self.listener_mode}'")
+
+        self.listener_idle_timeout = self._getFloat("PUBSUB_LISTENER_IDLE_TIMEOUT", self.listener_idle_timeout)
+
+        channel_backend = os.environ.get("RELAY_CHANNEL_BACKEND", self.channel_backend).lower()
+        if channel_backend in self.CHANNEL_BACKENDS:
+            self.channel_backend = channel_backend
+        else:
+            logger.warning(f"Unknown RELAY_CHANNEL_BACKEND '{channel_backend}', using '{self.channel_backend}'")
+        self.stream_maxlen = self._getInt("RELAY_STREAM_MAXLEN", self.stream_maxlen)
+        self.stream_ttl = self._getInt("RELAY_STREAM_TTL", self.stream_ttl)
+
+        self.unsubscribe_linger = self._getFloat("RELAY_UNSUBSCRIBE_LINGER", self.unsubscribe_linger)
+
+        self.callback_workers = self._getInt("RELAY_CALLBACK_WORKERS", self.callback_workers)
+        self.callback_queue_size = self._getInt("RELAY_CALLBACK_QUEUE_SIZE", self.callback_queue_size)
+
+        self.local_delivery = self._getBool("RELAY_LOCAL_DELIVERY", self.local_delivery)
+        self.relay_fast_path = self._getBool("RELAY_FAST_PATH", self.relay_fast_path)
+
+        self.rate_limit_enabled = self._getBool("RELAY_RATE_LIMIT", self.rate_limit_enabled)
+        # e.g. "player=20/40,host=60/120" (per second / burst); unlisted classes keep their defaults
+        rate_limits = os.environ.get("RELAY_RATE_LIMITS")
+        if rate_limits:
+            self.rate_limits = {**self.rate_limits, **self._parseRateLimits(rate_limits)}
+        self.rate_limit_max_violations = self._getInt("RELAY_RATE_LIMIT_MAX_VIOLATIONS", self.rate_limit_max_violations)
+        self.rate_limit_violation_window = self._getFloat("RELAY_RATE_LIMIT_VIOLATION_WINDOW", self.rate_limit_violation_window)
+
+        self.outbox_max_depth = self._getInt("RELAY_OUTBOX_MAX_DEPTH", self.outbox_max_depth)
+        self.outbox_max_bytes = self._getInt("RELAY_OUTBOX_MAX_BYTES", self.outbox_max_bytes)
+        self.outbox_max_lag = self._getFloat("RELAY_OUTBOX_MAX_LAG", self.outbox_max_lag)
+
+        # Comma-separated list; an empty value disables conflation
+        conflate_actions = os.environ.get("RELAY_CONFLATE_ACTIONS")
+        if conflate_actions is not None:
+            self.conflate_actions = frozenset(a.strip() for a in conflate_actions.split(",") if a.strip())
+
+        self.msgpack_enabled = self._getBool("RELAY_MSGPACK_ENABLED", self.msgpack_enabled)
+
+        self.host_batching_enabled = self._getBool("RELAY_HOST_BATCHING", self.host_batching_enabled)
+        self.host_batch_max_window = self._getFloat("RELAY_HOST_BATCH_MAX_WINDOW", self.host_batch_max_window)
+        self.host_batch_max_size = self._getInt("RELAY_HOST_BATCH_MAX_SIZE", self.host_batch_max_size)
+
+        self.state_sync_enabled = self._getBool("RELAY_STATE_SYNC", self.state_sync_enabled)
+        self.state_keyframe_interval = self._getInt("RELAY_STATE_KEYFRAME_INTERVAL", self.state_keyframe_interval)
+        self.state_ttl = self._getInt("RELAY_STATE_TTL", self.state_ttl)
+
+        self.ordered_delivery = self._getBool("RELAY_ORDERED_DELIVERY", self.ordered_delivery)
+        self.reorder_timeout = self._getFloat("RELAY_REORDER_TIMEOUT", self.reorder_timeout)
+        self.reorder_max_pending = self._getInt("RELAY_REORDER_MAX_PENDING", self.reorder_max_pending)
+        self.sequence_ttl = self._getInt("RELAY_SEQUENCE_TTL", self.sequence_ttl)
+
+        self.resume_enabled = self._getBool("RELAY_RESUME", self.resume_enabled)
+        self.resume_token_ttl = self._getInt("RELAY_RESUME_TTL", self.resume_token_ttl)
+        self.host_resume_grace = self._getFloat("RELAY_HOST_RESUME_GRACE", self.host_resume_grace)
+
+    @staticmethod
+    def _parseRateLimits(value):
+        """Parse "class=rate/burst,..." into {class: (rate, burst)}, skipping malformed entries"""
+        limits = {}
+        for entry in value.split(","):
+            try:
+                action_class, budget = entry.split("=", 1)
+                rate, burst = budget.split("/", 1)
+                limits[action_class.strip()] = (float(rate), float(burst))
+            except ValueError:
+                logger.warning(f"Ignoring malformed RELAY_RATE_LIMITS entry '{entry}'")
+        return limits
+
+    @staticmethod
+    def _getInt(name, default):
+        """Safely parse an integer environment variable, falling back to the default"""
+        try:
+            return int(os.environ.get(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    @staticmethod
+    def _getFloat(name, default):
+        """Safely parse a float environment variable, falling back to the default"""
+        try:
+            return float(os.environ.get(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    @staticmethod
+    def _getBool(name, default):
+        """Parse a boolean environment variable ("true"/"false")"""
+        value = os.environ.get(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,131 @@
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+class WebSocketConfig:
+    '''
+    handles the websocket server options of the multiplayer server (event loop, connection
+    limits/keepalive and permessage-deflate).
+    every value has a sensible default and can be overridden with an environment variable.
+
+    Compression trades CPU for bandwidth: large question/gameStateUpdate frames shrink a lot,
+    tiny timer ticks do not, so frames under compression_min_size are sent uncompressed.
+    '''
+    EVENT_LOOPS = ("auto", "uvloop", "asyncio")
+
+    def __init__(self):
+        # --- Event loop ---
+        # "auto": uvloop when it is installed, otherwise asyncio's default loop
+        self.event_loop = "auto"
+
+        # --- Connection options (websockets.serve) ---
+        # Largest incoming message in bytes (None = unlimited)
+        self.max_size = 1024 * 1024
+        # Incoming messages buffered per connection before reading from the socket pauses
+        self.max_queue = 16
+        # Outgoing buffer high-water mark in bytes; send() waits for the socket above it
+        self.write_limit = 32 * 1024
+        # Keepalive: seconds between pings and to wait for the pong (None = disabled)
+        self.ping_interval = 20.0
+        self.ping_timeout = 20.0
+        # Seconds to wait for the closing handshake before dropping the TCP connection
+        self.close_timeout = 10.0
+
+        # --- permessage-deflate ---
+        self.compression_enabled = True
+        # Frames smaller than this many bytes are sent uncompressed
+        self.compression_min_size = 256
+        # LZ77 window of the server compressor / requested from clients (8-15, 2**bits bytes)
+        self.server_max_window_bits = 12
+        self.client_max_window_bits = 12
+        # zlib memLevel (1-9): memory used for the compressor's internal state
+        self.memory_level = 5
+        # zlib compression level (0-9, -1 = zlib default)
+        self.compression_level = -1
+        # Reset the compressor after every message: no per-connection compressor memory between
+        # messages, at the cost of a worse ratio on repetitive streams
+        self.server_no_context_takeover = False
+        # Estimated compression memory this process may hold across all connections (bytes,
+        # 0 = unlimited); connections opened beyond it are served uncompressed
+        self.compression_memory_budget = 256 * 1024 * 1024
+
+        self._loadFromEnv()
+
+    def _loadFromEnv(self):
+        """Load websocket configuration from environment variables"""
+        event_loop = os.environ.get("WS_EVENT_LOOP", self.event_loop).lower()
+        if event_loop in self.EVENT_LOOPS:
+            self.event_loop = event_loop
+        else:
+            logger.warning(f"Unknown WS_EVENT_LOOP '{event_loop}', using '{self.event_loop}'")
+
+        self.max_size = self._getOptional("WS_MAX_SIZE", self.max_size, int)
+        self.max_queue = self._getOptional("WS_MAX_QUEUE", self.max_queue, int)
+        self.write_limit = self._getInt("WS_WRITE_LIMIT", self.write_limit)
+        self.ping_interval = self._getOptional("WS_PING_INTERVAL", self.ping_interval, float)
+        self.ping_timeout = self._getOptional("WS_PING_TIMEOUT", self.ping_timeout, float)
+        self.close_timeout = self._getOptional("WS_CLOSE_TIMEOUT", self.close_timeout, float)
+
+        self.compression_enabled = self._getBool("WS_COMPRESSION", self.compression_enabled)
+        self.compression_min_size = self._getInt("WS_COMPRESSION_MIN_SIZE", self.compression_min_size)
+        self.server_max_window_bits = self._getRange("WS_COMPRESSION_SERVER_WINDOW_BITS", self.server_max_window_bits, 9, 15)
+        self.client_max_window_bits = self._getRange("WS_COMPRESSION_CLIENT_WINDOW_BITS", self.client_max_window_bits, 9, 15)
+        self.memory_level = self._getRange("WS_COMPRESSION_MEM_LEVEL", self.memory_level, 1, 9)
+        self.compression_level = self._getRange("WS_COMPRESSION_LEVEL", self.compression_level, -1, 9)
+        self.server_no_context_takeover = self._getBool("WS_COMPRESSION_NO_CONTEXT_TAKEOVER", self.server_no_context_takeover)
+        self.compression_memory_budget = self._getInt("WS_COMPRESSION_MEMORY_BUDGET", self.compression_memory_budget)
+
+    def get_serve_options(self) -> dict:
+        """Connection options for websockets.serve()"""
+        return {
+            "max_size": self.max_size,
+            "max_queue": self.max_queue,
+            "write_limit": self.write_limit,
+            "ping_interval": self.ping_interval,
+            "ping_timeout": self.ping_timeout,
+            "close_timeout": self.close_timeout,
+        }
+
+    def get_compress_settings(self) -> dict:
+        """zlib.compressobj() settings for the server compressor"""
+        return {"level": self.compression_level, "memLevel": self.memory_level}
+
+    @staticmethod
+    def _getInt(name, default):
+        """Safely parse an integer environment variable, falling back to the default"""
+        try:
+            return int(os.environ.get(name, default))
+        except (ValueError, TypeError):
+            return default
+
+    @staticmethod
+    def _getOptional(name, default, parse):
+        """Parse a numeric environment variable where 0 or "none" means no limit (None)"""
+        value = os.environ.get(name)
+        if value is None:
+            return default
+        if value.strip().lower() in ("", "none", "0"):
+            return None
+        try:
+            return parse(value)
+        except ValueError:
+            logger.warning(f"Invalid {name}='{value}', using {default}")
+            return default
+
+    @classmethod
+    def _getRange(cls, name, default, minimum, maximum):
+        """Parse an integer environment variable that must lie within [minimum, maximum]"""
+        value = cls._getInt(name, default)
+        if not minimum <= value <= maximum:
+            logger.warning(f"{name}={value} is outside {minimum}-{maximum}, using {default}")
+            return default
+        return value
+
+    @staticmethod
+    def _getBool(name, default):
+        """Parse a boolean environment variable ("true"/"false")"""
+        value = os.environ.get(name)
+        if value is None:
+            return default
+        return value.strip().lower() in ("1", "true", "yes", "on")